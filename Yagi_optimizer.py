@@ -42,7 +42,22 @@ import logging
 
 import numpy as np
 import scipy.optimize
+import scipy.interpolate
+import scipy.ndimage
+import scipy.stats
 import math
+import functools
+import collections
+import multiprocessing
+import atexit
+
+try:
+    from numba import njit # optional. Compiles the numeric kernels
+except ImportError:
+    def njit(*args, **kwargs): # numba not installed: run the kernels as plain python
+        if len(args) == 1 and callable(args[0]):
+            return args[0]
+        return lambda function: function
 
 from PyNEC import *
 from antenna_util import *
@@ -50,23 +65,545 @@ from context_clean import *
 
 
 logging.basicConfig(format='%(levelname)s:%(message)s', level=logging.WARNING)
+logger = logging.getLogger(__name__)
 version = "1.0"
 date = "Nov 27, 2024"
 
 # Global iteration counter to show optimization progress
 iteration_count = 0
-
-# Global variables used in the optimization mapping plot
-sampledResults = []
-sampledL1 = []
-sampledL2 = []
-sampledL3 = []
-sampledD1 = []
-sampledD2 = []
         
 
 
 
+#################################################################
+#### Yagi model used by the optimization target.  Kept at module
+#### level and free of Qt objects so it can be pickled and run in
+#### the worker processes of the optimization pool
+#################################################################
+class GeometryError(Exception):
+    """ Raised when the yagi cannot be segmented within the NEC2 accuracy limits """
+
+
+class OptimizationStopped(Exception):
+    """ Raised by the optimization target to stop the algorithm early (see create_optimization_target) """
+
+
+SPEED_OF_LIGHT = 299792e3 # m/s
+
+# Conductivity of the element materials in mhos/m
+MATERIAL_CONDUCTIVITY = {"Aluminum": 25000000,        # 6061-T6
+                         "Brass": 15600000,
+                         "Stainless Steel": 1450000,
+                         "Copper": 57471264}
+
+
+class YagiParameters(object):
+    """ Snapshot of the design inputs needed to simulate and score a yagi """
+    def __init__(self, designFrq, elementDiameter, elementMaterial, foldedDipoleSpacing, useFoldedDipole,
+                 system_impedance, opt_freqs,
+                 vswrWeight, fwdGainWeight, fbRatioWeight):
+        self.designFrq = designFrq # design frequency in MHz
+        self.elementDiameter = elementDiameter # element diameter in inches
+        self.elementMaterial = elementMaterial
+        self.foldedDipoleSpacing = foldedDipoleSpacing # distance between driven element and folded element in meters
+        self.useFoldedDipole = useFoldedDipole
+        self.system_impedance = system_impedance
+
+        self.opt_freqs = opt_freqs # evenly stepped frequencies (MHz) for the optimization calculation (see frequency_range)
+
+        self.vswrWeight = vswrWeight
+        self.fwdGainWeight = fwdGainWeight
+        self.fbRatioWeight = fbRatioWeight
+
+        # Constants derived from the inputs. Calculated once here rather than on every simulation.
+        self.wire_radius = (elementDiameter)/2 * 0.0254 # diameter in inches, radius in meters
+        self.wavelength = SPEED_OF_LIGHT/(designFrq*1000000)
+        self.conductivity = MATERIAL_CONDUCTIVITY.get(elementMaterial) # None for an unknown material
+        self.extTWKernel = True # use extended thin wire kernel in the simulation
+        self.length_segments = yagi_segment_length(self)
+
+        # Minimum l1, l2, l3, d1, d2 that keep the geometry valid (see yagi_clamp_dimensions)
+        min_length = 2*self.length_segments # 2 segments
+        self.min_dimensions = np.array([min_length, min_length, min_length,
+                                        2*self.wire_radius + self.length_segments/1000,
+                                        foldedDipoleSpacing + 2*self.wire_radius + self.length_segments/1000])
+
+        # Dimensions below which there are mechanical interference problems (see yagi_dimensions_valid).
+        # The element lengths must be at least, and the spacings more than, these
+        elementDiameterMeters = elementDiameter * 0.0254
+        self.interference_dimensions = np.array([elementDiameterMeters, elementDiameterMeters, elementDiameterMeters,
+                                                 elementDiameterMeters, foldedDipoleSpacing + elementDiameterMeters])
+
+    def geometry_signature(self):
+        """ Tuple of the inputs that determine the simulated yagi for given dimensions (used to key caches) """
+        return (self.designFrq, self.elementDiameter, self.elementMaterial, self.foldedDipoleSpacing,
+                self.useFoldedDipole)
+
+    def signature(self):
+        """ Tuple of the inputs that determine simulation results and scores (used to validate caches) """
+        return self.geometry_signature() + (self.system_impedance, tuple(self.opt_freqs),
+                                            self.vswrWeight, self.fwdGainWeight, self.fbRatioWeight)
+
+
+#####################################################################################
+#### Calculate a wire segment length within the NEC2 accuracy bounds for the element
+#### diameter at the design frequency
+#####################################################################################
+def yagi_segment_length(params):
+    wire_radius = params.wire_radius
+    wavelength = params.wavelength
+
+    # calculate minimum segment length for good accuracy
+    if params.extTWKernel:
+        #length_segments_min = 2 * wire_radius # at non-junctions L/R>2
+        length_segments_min = 6 * wire_radius # at junctions L/R>6
+    else:
+        length_segments_min = 8 * wire_radius
+
+    # calculate maximum segment length for good accuracy
+    length_segments_max = wavelength/18 # max length per Cebik. Others use wl/10
+
+    # NOTE: for length_segments_min < length_segments_max,
+    #       f_mhz < 2.77777 / radius_wire
+
+
+    # set segment length to value within NEC2 accuracy bounds
+    if (length_segments_max > length_segments_min):
+        length_segments = math.sqrt(length_segments_max * length_segments_min) # set to geometric mean
+        #length_segments = length_segments_min # make as small as practical (slows things down at low freqs)
+    else: # This happens if freq > 1,749.8 MHz for 1/8" diameter wire, 218.7 MHz for 1" diameter (see NOTE above)
+        length_segments = length_segments_max # make as small as practical (max is smaller than min here)
+        logger.warning("GEOMETRY WARNING: Element diameter too large at this frequency. length_segments_min=%6.3f >= length_segments_max=%6.3f", length_segments_min, length_segments_max)
+
+    if length_segments < wavelength/1000:
+        length_segments = wavelength/1000 # set to minimum allowed
+        logger.critical("GEOMETRY ERROR: Wire segment length too short (less than wl/1000). Results may be invalid.")
+        # TODO: Maybe set length to wl/1000+.0000001 and don't exit
+        raise GeometryError("Wire segment length too short (less than wl/1000). Results may be invalid.")
+
+    return length_segments
+#####################################################################################
+
+
+
+#####################################################################################
+#### Number of segments for an element of the given length.  Always odd, so the feed
+#### can be at the center segment
+#####################################################################################
+def yagi_segment_count(length, length_segments):
+    nr_segments = int(length / length_segments)
+    if nr_segments % 2 == 0: nr_segments = nr_segments - 1 # Set to an odd number of segments (reduce segs)
+    return nr_segments
+#####################################################################################
+
+
+
+#####################################################################################
+#### Set mnimimum dimensions to ensure geometry is valid and no mechanical interference occurs
+#### d2 must exceed (Wire diameter + foldedDipoleSpacing) to prevent mechanical interference
+#### d1 must exceed the wire diameter
+#####################################################################################
+def yagi_clamp_dimensions(params, l1, l2, l3, d1, d2):
+    #print ("number reflector segs = ", l1 / params.length_segments, l1, params.length_segments)
+    # fmax also replaces a NaN dimension with its minimum
+    return np.fmax(np.array([l1, l2, l3, d1, d2]), params.min_dimensions)
+#####################################################################################
+
+
+
+#####################################################################################
+# Geometry for a generic 3-element yagi parallel to the y-axis and pointing in the +x direction
+# Yagi dimensions are defined as:
+#     l1: length of reflector element in meters
+#     l2: length of driven element in meters
+#     l3: length of director element in meters
+#     d1: distance between reflector and driven elements in meters
+#     d1: distance between director and driven elements in meters
+#
+# The driven dipole is at the origin. It is a folded dipole with 5-cm spacing
+# Dipoles are parallel to the y axis; the driven element is centered at (0, 0, 0)
+#####################################################################################
+def yagi_geometry(params, l1, l2, l3, d1, d2):
+    wire_radius = params.wire_radius
+    foldedDipoleSpacing = params.foldedDipoleSpacing  # distance between driven element and folded element in meters
+    length_segments = params.length_segments
+
+    if params.conductivity is None:
+        return # should never get here (leave placeholder for additional materials)
+
+    nec = context_clean(nec_context())
+    nec.set_extended_thin_wire_kernel(params.extTWKernel)
+    geo = geometry_clean(nec.get_geometry())
+
+    l1, l2, l3, d1, d2 = yagi_clamp_dimensions(params, l1, l2, l3, d1, d2)
+
+
+    # define the elements' coordinates and parameters
+    # Note that nec tags start at 1 (not zero-indexed)
+
+    #### Reflector Element
+    nr_segments = yagi_segment_count(l1, length_segments)
+    geo.wire(tag_id=1, nr_segments=nr_segments, src=[-d1, -l1/2, 0], dst=[-d1, l1/2, 0], radius=wire_radius)
+
+    #### Driven element
+    nr_segments = yagi_segment_count(l2, length_segments)  # <--- MUST be an odd number so that source can be in center
+    geo.wire(tag_id=2, nr_segments=nr_segments, src=[0, -l2/2, 0], dst=[0, l2/2, 0], radius=wire_radius)
+    driver_center_seg = int(nr_segments/2) + 1
+
+    #### Folded dipole element and connection segments
+    if params.useFoldedDipole:
+        nrEndSegments = max(1, int(foldedDipoleSpacing/length_segments)) # ensure there are at minimum 1 segments
+        # Check junctions (l_seg_big/l_seg_small<5 and wire_radius1/wire_radius2<5 to avoid errors)
+        lengthEndSegments = foldedDipoleSpacing/nrEndSegments
+        if max(lengthEndSegments, length_segments)/min(lengthEndSegments, length_segments) > 5: #(Error if Lbig/Lsmall>5 at junction)
+            logger.critical("GEOMETRY ERROR: Folded dipole segment length too short at junctions. Results may be invalid.")
+            logger.critical("ratio=%6.3f  segment 1: %6.3f, segment 2: %6.3f",
+                max(lengthEndSegments, length_segments)/min(lengthEndSegments, length_segments),
+                length_segments, lengthEndSegments)
+            logger.critical("This error often occurs if the element radius is too large.")
+            raise GeometryError("Folded dipole segment length too short at junctions. Results may be invalid.\n" +
+                                "This error often occurs if the element radius is too large.")
+
+        geo.wire(tag_id=4, nr_segments=nr_segments, src=[foldedDipoleSpacing, -l2/2, 0], dst=[foldedDipoleSpacing, l2/2, 0], radius=wire_radius)
+        geo.wire(tag_id=5, nr_segments=nrEndSegments, src=[0, -l2/2, 0], dst=[foldedDipoleSpacing, -l2/2, 0], radius=wire_radius)
+        geo.wire(tag_id=6, nr_segments=nrEndSegments, src=[0, l2/2, 0], dst=[foldedDipoleSpacing, l2/2, 0], radius=wire_radius)
+
+    #### Director Element
+    nr_segments = yagi_segment_count(l3, length_segments)
+    geo.wire(tag_id=3, nr_segments=nr_segments, src=[d2, -l3/2, 0], dst=[d2, l3/2, 0], radius=wire_radius)
+
+
+    nec.set_wire_conductivity(params.conductivity)
+    nec.geometry_complete(ground_plane=False)
+
+
+    nec.voltage_excitation(wire_tag=2, segment_nr=driver_center_seg, voltage=1.0)
+
+    return nec
+#####################################################################################
+
+
+
+#####################################################################################
+#### Frequencies (MHz) from start to stop (inclusive) in steps of step.  The count is
+#### worked out first (the small tolerance keeps floating point rounding from dropping
+#### the stop frequency), so the last frequency never overshoots stop, as np.arange
+#### with a half step margin can when stop is midway between two steps.
+#####################################################################################
+def frequency_count(start, stop, step):
+    if step <= 0:
+        return 1
+    return max(0, int(math.floor((stop - start)/step + 1e-9)) + 1)
+
+def frequency_range(start, stop, step):
+    count = frequency_count(start, stop, step)
+    return np.linspace(start, start + (count - 1)*step, count)
+#####################################################################################
+
+
+
+# Radiation pattern grids, as (start, stop, count) degree ranges of the thetas and phis.
+# Frequency sweeps (so every optimization iteration) only need the boresight forward and
+# reverse gains: theta 90 at phi 0 and 180.  Keep them that way, as each extra direction is
+# solved at every frequency.  The full sphere grids are for the report patterns only.
+SWEEP_PATTERN = ((90, 90, 1), (0, 360, 2)) # phi range 0..360 with count=2 produces points at 0 and 180 (step=(360-0)/2 )
+REPORT_PATTERN_3D = ((0, 184, 46), (0, 364, 91))
+REPORT_PATTERN_2D = ((-180, 180, 60), (0, 360, 60)) # solved every 6 degrees and
+REPORT_PATTERN_2D_ZOOM = 3                          # interpolated to every 2 degrees for display (see pattern_zoom)
+DEG2RAD = math.pi / 180.0 # NEC2 pattern angles are in degrees, the plots are in radians
+REPORT_CACHE_SIZE = 64 # report sweeps and patterns kept (see get_gain_swr_range and get_patterns)
+
+
+#####################################################################################
+#### Perform an NEC2 analysis on a 3-element yagi passed to this function over a range
+#### of frequencies provided.  Returns arrays of Freq, Fwd Gain, VSWR, and Rev Gain
+#####################################################################################
+def yagi_gain_swr_range(params, l1, l2, l3, d1, d2, freqs):
+    count = len(freqs)
+    fwd_gains = np.empty(count)
+    frequencies = np.empty(count)
+    impedances = np.empty(count, dtype=complex)
+    rev_gains = np.empty(count)
+
+    if count == 0:
+        return frequencies, fwd_gains, fwd_gains.copy(), rev_gains
+    start = freqs[0]
+    step = freqs[1] - freqs[0] if count > 1 else 0.0
+
+    # Run the whole sweep with a single FR card. The geometry (and its NEC2 context) is
+    # built once and NEC2 leaves the results of the i'th frequency at index i.
+    nec = yagi_geometry(params, l1, l2, l3, d1, d2)
+    nec.set_frequencies_stepped(start, step, count)
+    thetas, phis = SWEEP_PATTERN
+    nec.radiation_pattern(thetas=Range(*thetas), phis=Range(*phis))
+
+    for index in range(count):
+        rp = nec.context.get_radiation_pattern(index)
+        ipt = nec.get_input_parameters(index)
+
+        gains = rp.get_gain()
+        fwd_gains[index] = gains[0][0] # Gain at phi = 0 degrees
+        rev_gains[index] = gains[0][1] # Gain at phi = 180 degrees
+        impedances[index] = ipt.get_impedance()[0]
+        frequencies[index] = ipt.get_frequency()
+
+    vswrs = sweep_vswrs(impedances, params.system_impedance) # VSWR over the whole sweep at once
+
+    return frequencies, fwd_gains, vswrs, rev_gains
+#####################################################################################
+
+
+
+#####################################################################################
+#### Solve the radiation pattern of a 3-element yagi at freq_mhz over the theta and phi
+#### ranges (start, stop, count) in degrees.  Returns the gains (dBi) and the theta and
+#### phi angles in radians.  The angles are float32 as they are only displayed.  The gains
+#### stay float64: symmetric lobes have gains equal to float32 precision, so the max gain
+#### would be found in either of them.  If nec is passed, the pattern is solved on that (already
+#### built) geometry of the yagi, so patterns at several frequencies can share one.
+#####################################################################################
+def yagi_pattern(params, l1, l2, l3, d1, d2, freq_mhz, thetas, phis, nec=None):
+    if nec is None:
+        nec = yagi_geometry(params, l1, l2, l3, d1, d2)
+    index = getattr(nec, "patternCount", 0) # NEC2 keeps the patterns solved on a geometry, in order
+    nec.set_frequency(freq_mhz)
+    nec.radiation_pattern(thetas=Range(*thetas), phis=Range(*phis), average=0) # python crashes if both counts>1 and average<>0 
+    nec.patternCount = index + 1
+    rp = nec.context.get_radiation_pattern(index) #get the radiation_pattern
+
+    theta_angles = np.multiply(rp.get_theta_angles(), DEG2RAD, dtype=np.float32) # converted in one pass
+    phi_angles = np.multiply(rp.get_phi_angles(), DEG2RAD, dtype=np.float32)
+    return rp.get_gain(), theta_angles, phi_angles # gain is an array of theta,phi -> gain (in dBi).
+#####################################################################################
+
+
+
+#####################################################################################
+#### Interpolate a pattern (gains in dBi over the theta and phi angles) to factor times
+#### as many angles with a cubic spline.  A smooth yagi pattern is resolved well from a
+#### coarse solve, which costs a fraction of a fine one.  Gains are first clipped to
+#### floor_db below the max, as NEC2 reports nulls as -999.99 dB, which would ring.
+#####################################################################################
+def pattern_zoom(gains_db, thetas, phis, factor, floor_db=50):
+    shape = [(n - 1)*factor + 1 for n in gains_db.shape] # keeps the first and last angles, with factor times smaller steps
+    gains_db = np.maximum(gains_db, gains_db.max() - floor_db)
+    gains_db = scipy.ndimage.zoom(gains_db, [m / n for m, n in zip(shape, gains_db.shape)], order=3)
+    return (gains_db, np.linspace(thetas[0], thetas[-1], shape[0], dtype=thetas.dtype),
+            np.linspace(phis[0], phis[-1], shape[1], dtype=phis.dtype))
+#####################################################################################
+
+
+
+#####################################################################################
+#### Pool of worker processes shared by the pooled optimization algorithms, long
+#### frequency sweeps and report patterns.  Created the first time it is needed, not
+#### at startup, and kept for the next runs.  None on a single core machine (nothing to gain).
+#####################################################################################
+_worker_pool = None
+
+def worker_pool():
+    global _worker_pool
+    if _worker_pool is None and multiprocessing.cpu_count() > 1:
+        _worker_pool = multiprocessing.Pool()
+        atexit.register(_worker_pool.terminate) # rather than leave it to be collected at interpreter exit
+    return _worker_pool
+#####################################################################################
+
+
+
+#####################################################################################
+#### Same as yagi_gain_swr_range, but if pooled (never in a worker process), the
+#### frequencies are split into contiguous sub-sweeps of at least SPLIT_MIN_FREQS,
+#### one per process of the worker pool, and simulated in parallel.  Shorter sweeps,
+#### such as the optimization's few frequencies, are simulated here (without starting
+#### the pool): a frequency takes a few ms, less than the round trip to a worker.
+#####################################################################################
+SPLIT_MIN_FREQS = 16
+
+def yagi_gain_swr_range_split(params, l1, l2, l3, d1, d2, freqs, pooled=False):
+    count = min(len(freqs) // SPLIT_MIN_FREQS, multiprocessing.cpu_count())
+    pool = worker_pool() if pooled and count > 1 else None
+    if pool is None: # not worth the overhead of the pool
+        return yagi_gain_swr_range(params, l1, l2, l3, d1, d2, freqs)
+
+    chunks = np.array_split(freqs, count)
+    results = pool.starmap(yagi_gain_swr_range, [(params, l1, l2, l3, d1, d2, chunk) for chunk in chunks])
+    return tuple(np.concatenate(arrays) for arrays in zip(*results)) # freqs, fwd_gains, vswrs, rev_gains
+#####################################################################################
+
+
+
+#####################################################################################
+#### Check that dimensions are valid and no mechanical interference problems
+#####################################################################################
+def yagi_dimensions_valid(params, args):
+    args = np.asarray(args, dtype=float)
+    l1, l2, l3, d1, d2 = args
+    limits = params.interference_dimensions
+
+    if not np.all(np.isfinite(args)): # first, as NaN fails every comparison below
+        if logger.isEnabledFor(logging.WARNING):
+            logger.warning("TARGET WARNING: Geometry dimensions invalid (NaN or inf) l1=%6.3f l2=%6.3f, l3=%6.3f, d1=%6.3f d2=%6.3f", l1, l2, l3, d1, d2)
+        return False
+    if np.any(args[:3] < limits[:3]) or np.any(args[3:] <= limits[3:]):
+        if logger.isEnabledFor(logging.WARNING):
+            logger.warning("TARGET WARNING: Geometry dimensions out of range l1=%6.3f l2=%6.3f, l3=%6.3f, d1=%6.3f d2=%6.3f", l1, l2, l3, d1, d2)
+        return False
+    return True
+#####################################################################################
+
+
+
+#####################################################################################
+#### Key used to cache scores of valid geometries.  The dimensions are clamped the
+#### same way yagi_geometry clamps them (so geometries that simulate identically
+#### share a key) and snapped to a grid of wavelength/1e6, far below the wl/1000
+#### segment accuracy floor
+#####################################################################################
+def yagi_cache_key(params, args):
+    grid = params.wavelength * 1e-6
+    return tuple(np.round(yagi_clamp_dimensions(params, *args) / grid) * grid)
+#####################################################################################
+
+
+
+#####################################################################################
+#### VSWR at each frequency of a sweep from the feed point impedances z and the system
+#### impedance z0 (see antenna_util.vswr).  Compiled with numba (when installed) along
+#### with compose_cost.  Both are compiled eagerly (signatures given) when the module
+#### is imported, so the pool's worker processes start with the compiled kernels.
+#### The reflection coefficient is capped at MAX_REFLECTION, so an open or shorted
+#### feed point gets a huge but finite VSWR rather than a division by zero.
+#####################################################################################
+MAX_REFLECTION = 1 - 1e-9
+
+@njit("float64[:](complex128[:], float64)", cache=True, fastmath=True)
+def sweep_vswrs(z, z0):
+    vswrs = np.empty(z.shape[0])
+    for i in range(z.shape[0]):
+        gamma = min(abs((z[i] - z0) / (z[i] + z0)), MAX_REFLECTION) # reflection coefficient
+        vswrs[i] = (1 + gamma) / (1 - gamma)
+    return vswrs
+#####################################################################################
+
+
+
+#####################################################################################
+#### Convert a (scaled) radiation pattern from polar to cartesian coords.  gains[i, j]
+#### is the length in the direction of the i'th theta and j'th phi, given by the sines
+#### and cosines of the angles (see uiMainWindow.get_pattern_trig, which keeps them for
+#### each pattern grid).  Returns X, Y, Z of the pattern surface.  Compiled with numba
+#### (when installed) to make one pass over the grid.
+#####################################################################################
+@njit("UniTuple(float32[:, :], 3)(float64[:, :], float32[:], float32[:], float32[:], float32[:])", cache=True, fastmath=True)
+def pattern_to_xyz(gains, sin_thetas, cos_thetas, sin_phis, cos_phis):
+    rows, columns = gains.shape
+    X = np.empty((rows, columns), dtype=np.float32) # only displayed, like the angles (see yagi_pattern)
+    Y = np.empty((rows, columns), dtype=np.float32)
+    Z = np.empty((rows, columns), dtype=np.float32)
+    for i in range(rows):
+        for j in range(columns):
+            X[i, j] = gains[i, j] * sin_thetas[i] * cos_phis[j]
+            Y[i, j] = gains[i, j] * sin_thetas[i] * sin_phis[j]
+            Z[i, j] = gains[i, j] * cos_thetas[i]
+    return X, Y, Z
+#####################################################################################
+
+
+
+#####################################################################################
+#### Calculate a score for VSWR, Fwd Gain and Rev Gain over the optimization freq range
+#### and combine them into the weighted objective to be minimized.
+#### Compiled with numba (when installed) as it runs for every optimization iteration.
+#####################################################################################
+@njit("float64(float64[:], float64[:], float64[:], float64, float64, float64)", cache=True, fastmath=True)
+def compose_cost(gains, vswrs, rev_gains, vswrWeight, fwdGainWeight, fbRatioWeight):
+    vswr_score = 0.0
+    gains_score = 0.0
+    rev_gains_score = 0.0
+    for i in range(gains.shape[0]):
+        gains_score += gains[i]     # gain values are in dBi
+        #if vswrs[i] >= 1.8:         # invoke a severe penalty when VSWR
+        #    vswr_score += np.exp(vswrs[i]) - vswrs[i] # exceeds 1.8 within the freq ranges :)
+        vswr_score += vswrs[i]
+        if rev_gains[i] > -30:   # shoot for f/b of around 30 (no improvement to score if less)
+            rev_gains_score += rev_gains[i]
+        #rev_gains_score += rev_gains[i]
+
+    # Calculate an objective function to be minimized based on the scores
+    #    * VSWR should minimal, gains maximal, front-to-back minimal
+    #    * "result" variable decreases as these criteria are met
+    #    * Note that each contributer is weighted so that each carries appr. equal contribution
+    result = vswrWeight*vswr_score - fwdGainWeight*gains_score + fbRatioWeight*(rev_gains_score - gains_score)
+
+    # experiment with alternative objective function scoring system that goes very negative
+    # when all 3 objectives near target simultaneously
+    #  --- Gives worse result, and with 3X the iterations (26,126)
+    #num_frqs = (stop_frq_opt-start_frq_opt)/step_frq_opt + 1
+    #result = -1/((vswr_score-num_frqs) + (-gains_score + 9.5*num_frqs) + (rev_gains_score + 30*num_frqs))
+
+    return result
+#####################################################################################
+
+
+
+#####################################################################################
+#### Objective function to calculate a score to be minimized by the optimization algorithms.
+#### Scores the geometry in args for variables: Fwd gain, VSWR, Rev Gain over the
+#### optimization freq range.  Returns (score, gain, rev_gain, vswr) where gain, rev_gain
+#### and vswr are the values at the last frequency (used for progress feedback), or
+#### (inf, None, None, None) if the geometry is invalid
+#####################################################################################
+def yagi_score(params, args, pooled=False):
+    if not yagi_dimensions_valid(params, args):
+        return float('inf'), None, None, None
+
+    l1, l2, l3, d1, d2 = args
+
+    try: # simulate yagi and return the parameters (splitting a long sweep over the worker pool, if pooled)
+        freqs, gains, vswrs, rev_gains = yagi_gain_swr_range_split(params, l1, l2, l3, d1, d2, params.opt_freqs, pooled)
+    except RuntimeError as err: # Usually a geometry error occured if we get here
+        if logger.isEnabledFor(logging.WARNING):
+            logger.warning("TARGET WARNING: Exception while calculating optimization score: %s", err)
+            logger.warning("l1=%6.3f l2=%6.3f, l3=%6.3f, d1=%6.3f d2=%6.3f diameter=%6.3f", l1, l2, l3, d1, d2, params.elementDiameter * 0.0254)
+        return float('inf'), None, None, None
+
+
+    result = compose_cost(gains, vswrs, rev_gains, params.vswrWeight, params.fwdGainWeight, params.fbRatioWeight)
+
+    return result, gains[-1], rev_gains[-1], vswrs[-1]
+#####################################################################################
+
+
+
+#####################################################################################
+#### Brute force optimization of a surrogate of the (expensive) target.  The target is
+#### sampled at n_samples Latin hypercube points, passed to it as a single vectorized
+#### (5, n_samples) batch so it can score them in its pool.  A radial basis function
+#### fitted to the scores is searched on a grid of Ns points per dimension, and the
+#### best grid point is polished with Nelder-Mead on the real target.
+#### Needs ~n_samples simulations instead of the Ns^5 of a brute force search.
+#####################################################################################
+def surrogate_brute(target, bounds, n_samples=2000, Ns=14, seed=42):
+    lower, upper = np.array(bounds).T
+
+    # Sample and fit in the unit cube so all dimensions carry equal weight in the RBF
+    samples = scipy.stats.qmc.LatinHypercube(d=len(bounds), seed=seed).random(n_samples)
+    scores = np.asarray(target(scipy.stats.qmc.scale(samples, lower, upper).T))
+    valid = np.isfinite(scores)
+    surrogate = scipy.interpolate.RBFInterpolator(samples[valid], scores[valid])
+
+    axes = [np.linspace(0, 1, Ns)] * len(bounds)
+    grid = np.stack(np.meshgrid(*axes, indexing='ij'), axis=-1).reshape(-1, len(bounds))
+    best = grid[np.argmin(surrogate(grid))]
+
+    x0 = scipy.stats.qmc.scale(best[np.newaxis, :], lower, upper)[0]
+    return scipy.optimize.minimize(target, x0, method='Nelder-Mead', bounds=bounds)
+#####################################################################################
+
+
+
+
 #################################################################
 class MplFigure(object):
     def __init__(self, parent):
@@ -75,6 +612,34 @@ class MplFigure(object):
         self.toolbar = NavigationToolbar(self.canvas, parent) 
 #################################################################
 
+
+#################################################################
+#### Runs an optimization off the UI thread so the Qt event loop
+#### keeps running.  Pooled runs score in the shared worker pool
+#### (see worker_pool); results are delivered through signals.
+#### Exactly one of finished or failed is emitted per run.
+#################################################################
+class OptWorker(QtCore.QObject):
+    progress = QtCore.pyqtSignal(str)     # status text for the latest scored geometry
+    finished = QtCore.pyqtSignal(object)  # the scipy OptimizeResult
+    failed = QtCore.pyqtSignal(str)       # the error, if the optimization raised one
+
+    def __init__(self, optimize, pooled):
+        super().__init__()
+        self.optimize = optimize  # optimize(pool, progress) runs the algorithm and returns its result
+        self.pooled = pooled      # True to score in the pool of worker processes
+
+    def run(self):
+        try:
+            pool = worker_pool() if self.pooled else None # also None on a single core machine
+            optimized_result = self.optimize(pool, self.progress.emit)
+        except Exception as err: # an exception would otherwise end the thread silently, with the UI still waiting
+            logger.exception("Optimization failed")
+            self.failed.emit(str(err))
+        else:
+            self.finished.emit(optimized_result)
+#################################################################
+
         
 #################################################################
 class uiMainWindow(QMainWindow):
@@ -132,16 +697,78 @@ class uiMainWindow(QMainWindow):
         self.OptAlgorithmComboBox.addItems(["Diff Evolution", "Basin Hopping", 
                                             "Dual Annealing", "Gradient Descent",
                                             "Dividing Rectangles", "Simplicial Homology", 
-                                            "Brute Force"])
+                                            "Brute Force", "Surrogate Brute"])
         self.OptAlgorithmComboBox.setCurrentIndex(0) # default "Diff Evolution"
 
+        #### Optimization algorithms selectable in the combo box.  Each is called with
+        #### (target, bounds, x0) and returns a result with the optimized dimensions in .x
+        minimizer_kwargs = dict(method='Nelder-Mead')
+        self._opt_dispatch = {
+            # Use differential evolution: (Good results @ 70626 iterations)
+            # Each generation is scored as a single vectorized batch spread over a pool of worker processes (one per core)
+            # Sobol init covers the 5-D space evenly so fewer generations are needed. Polish is optional since the
+            # VSWR/gain surface is not smooth and the L-BFGS-B finite differences cost extra NEC runs
+            "Diff Evolution": lambda target, bounds, x0: scipy.optimize.differential_evolution(
+                target, bounds, seed=42, disp=False, popsize=15, init='sobol', mutation=(0.3, 1.0), recombination=0.9,
+                tol=1e-3, updating='deferred', vectorized=True, polish=self.polishDE),
+
+            # Use basin hopping: (works good. May need to adjust parameters T, step size etc.)
+            "Basin Hopping": lambda target, bounds, x0: scipy.optimize.basinhopping(
+                target, x0, minimizer_kwargs=minimizer_kwargs, niter=10, stepsize=0.015, T=2.0, seed=42, disp=True),
+
+            # Use Dual Annealing: 
+            "Dual Annealing": lambda target, bounds, x0: scipy.optimize.dual_annealing(
+                target, bounds, seed=42, minimizer_kwargs=minimizer_kwargs),
+
+            # Use gradient descent: (finds local minimum only; Fast )
+            "Gradient Descent": lambda target, bounds, x0: scipy.optimize.minimize(
+                target, x0, method='Nelder-Mead', bounds=bounds),
+
+            # Use Dividing Rectangles: (Not locally biased, to search the whole multimodal surface.
+            # Stops once the rectangles are small or after 2000 evaluations)
+            "Dividing Rectangles": lambda target, bounds, x0: scipy.optimize.direct(
+                target, bounds, locally_biased=False, maxfun=2000, vol_tol=1e-8),
+
+            # Use simplicial homology global optimization
+            "Simplicial Homology": lambda target, bounds, x0: scipy.optimize.shgo(
+                target, bounds, minimizer_kwargs=minimizer_kwargs),
+
+            # Use brute force optimization: (With Ns=10: ~100k iterations. With Ns=14: >500k iterations [Ns^5]. Takes hours)
+            # brute returns the optimum itself rather than a result structure, so wrap it in one
+            "Brute Force": lambda target, bounds, x0: scipy.optimize.OptimizeResult(
+                x=scipy.optimize.brute(target, bounds, full_output=True, Ns=10)[0]),
+
+            # Use brute force on a surrogate fitted to ~2000 samples scored in a pool of worker processes
+            "Surrogate Brute": lambda target, bounds, x0: surrogate_brute(target, bounds),
+        }
+        # Algorithms that pass batches of candidates to the target, to be scored in a pool of worker processes
+        self._pooled_algorithms = {"Diff Evolution", "Surrogate Brute"}
+        # Algorithms that sample the bounds evenly.  All their candidates are simulated, without
+        # the pre-filters of create_optimization_target, as penalizing part of the bounds would skew the samples
+        self._sampling_algorithms = {"Brute Force", "Surrogate Brute"}
+        # Algorithms stopped early once this many iterations pass without improving the best score.
+        # The others sample the bounds systematically or converge on their own, so a plateau says nothing
+        self._stop_patience = {"Basin Hopping": 1500, "Dual Annealing": 1500}
+        self._optThread = None # thread running the optimization worker (see updatePlot)
+        self._optCancelled = False # set to stop the running optimization (see closeEvent)
+        # Trace used in the optimization mapping plot.  Row i holds l1, l2, l3, d1, d2 and the
+        # score of the i'th scored geometry (rows past iteration_count are unused)
+        self._trace = np.empty((0, 6), dtype=np.float32)
+        self._inputs = None    # input values seen by the last onValueChanged
+        self._scoreCache = None          # optimization scores, kept across runs (see create_optimization_target)
+        self._scoreCacheSignature = None # YagiParameters.signature() of the inputs the scores are for
+        self._sweepCache = collections.OrderedDict()   # report frequency sweeps, least recently used first (see get_gain_swr_range)
+        self._patternCache = collections.OrderedDict() # report radiation patterns, least recently used first (see get_patterns)
+        self._patternAngles = {}         # theta/phi angles (radians) of the report pattern grids (see get_patterns)
+        self._patternTrig = {}           # sines and cosines of those angles (see get_pattern_trig)
+
 
        
         #### Connect signals from menu item selections ####
         self.actionOpen_Yagi_File.triggered.connect(lambda: self.clicked("Open Yagi File Was Clicked"))
         self.actionSave_Yagi_File.triggered.connect(lambda: self.clicked("Save Yagi File Was Clicked"))
         self.actionAbout.triggered.connect(lambda: self.clicked("About Was Clicked"))
-        self.actionExit.triggered.connect(sys.exit)
+        self.actionExit.triggered.connect(self.close) # see closeEvent
         
         #### Connect signals from entry box changes ####
         self.DesignFrqDoubleSpinBox.valueChanged.connect(self.onValueChanged)
@@ -165,6 +792,7 @@ class uiMainWindow(QMainWindow):
         self.FBRatioWeightDoubleSpinBox.valueChanged.connect(self.onValueChanged)
 
         self.useFoldedDipoleRadioButton.clicked.connect(self.onValueChanged)
+        self.PolishCheckBox.clicked.connect(self.onValueChanged)
         self.optimizePushButton.clicked.connect(self.updatePlot)
 
     
@@ -184,7 +812,11 @@ class uiMainWindow(QMainWindow):
     #### initialize MatPlotLib plot and update with default values
     #################################################################
     def initMplWidget(self):
-        self.ax = self.main_figure.figure.add_subplot(111)
+        self.gainAxes = None     # report plots are created by the first show_report
+        self.reportCursor = None # mplcursors cursor of the latest report
+        self.reportCursorArtists = None # the report artists it was created for
+        self.plot_3d = True # "True" selects 3-D plot.  "False" selects 2-D plot for subplot (223)        
+        self.optMap = True  # "True" plots opimizaiton map.  "False" plots F/B ratio vs frequency
         self.onValueChanged() # call event handler that reads inputs
         self.initializePlot() # add plots of initial guess at dimensions 
     #################################################################
@@ -274,7 +906,19 @@ class uiMainWindow(QMainWindow):
     #################################################################
     #@pyqtSlot()   # Do I need this??
     def onValueChanged(self):
-        
+        # Nothing to do if no input actually changed (e.g. a value was typed in again)
+        inputs = (self.DesignFrqDoubleSpinBox.value(),
+                  self.OptFrqStrtDoubleSpinBox.value(), self.OptFrqStopDoubleSpinBox.value(), self.OptFrqStepDoubleSpinBox.value(),
+                  self.PlotFrqMinDoubleSpinBox.value(), self.PlotFrqMaxDoubleSpinBox.value(), self.PlotFrqStepDoubleSpinBox.value(),
+                  self.ElementDiameterDoubleSpinBox.value(), self.ElementMaterialComboBox.currentText(),
+                  self.FoldedDipoleSpcDoubleSpinBox.value(), self.useFoldedDipoleRadioButton.isChecked(),
+                  self.OptAlgorithmComboBox.currentText(), self.VswrWeightDoubleSpinBox.value(),
+                  self.FwdGainWeightDoubleSpinBox.value(), self.FBRatioWeightDoubleSpinBox.value(),
+                  self.PolishCheckBox.isChecked())
+        if inputs == self._inputs:
+            return
+        self._inputs = inputs
+
         self.designFrq = self.DesignFrqDoubleSpinBox.value()
 
         self.optFrqStrt = self.OptFrqStrtDoubleSpinBox.value()
@@ -295,14 +939,61 @@ class uiMainWindow(QMainWindow):
         self.vswrWeight = self.VswrWeightDoubleSpinBox.value()
         self.fwdGainWeight = self.FwdGainWeightDoubleSpinBox.value()
         self.fbRatioWeight = self.FBRatioWeightDoubleSpinBox.value()
+        self.polishDE = self.PolishCheckBox.isChecked()
 
-        self.optimizePushButton.setText('Optimize')
-        self.optimizePushButton.setEnabled(True)
+        # Frequencies swept for the plots and the optimization
+        self._plot_freqs = frequency_range(self.plotFrqMin, self.plotFrqMax, self.plotFrqStep)
+        self._opt_freqs = frequency_range(self.optFrqStrt, self.optFrqStop, self.optFrqStep)
+        self._mid_frq_opt = math.sqrt(self.optFrqStrt*self.optFrqStop) # geometric mean of the optimization freq range
+
+        self._recompute_design_constants()
+
+        if self._optThread is None or not self._optThread.isRunning(): # don't allow a second optimization to start
+            self.optimizePushButton.setText('Optimize')
+            self.optimizePushButton.setEnabled(True)
 
         #self.updatePlot() 
     #################################################################
 
 
+    #################################################################
+    ####  This method recalculates the constants derived from the
+    ####  inputs: the wavelength, the "rule of thumb" initial guess
+    ####  for the element dimensions and the optimization bounds
+    #################################################################
+    def _recompute_design_constants(self):
+        self._wavelength = SPEED_OF_LIGHT/(self.designFrq*1000000)
+
+        # Starting "rule of thumb" values for element lengths pre-optimization
+        '''
+        initial_l1  = 1.05 * self.wavelength / 2 # reflector length initial guess .989
+        initial_l2  = 0.98 * self.wavelength / 2 # driven element length initial guess .946
+        initial_l3  = 0.88 * self.wavelength / 2 # director length initial guess .88
+        initial_d1  = 0.60 * self.wavelength / 4 # distance reflector to driven element initial guess
+        initial_d2  = 0.50 * self.wavelength / 4 # distance driven element to director initial guess
+        '''
+        self._initial = np.array([0.487,  # reflector length initial guess
+                                  0.437,  # driven element length initial guess
+                                  0.450,  # director length initial guess
+                                  0.111,  # distance reflector to driven element initial guess
+                                  0.184]) * self._wavelength # distance driven element to director initial guess
+
+        # Assume that the initial guess is within +/-25% of the optimum dimensions and use as optimizatin bounds
+        # (+/-50% for the spacings)
+        wire_radius = (self.elementDiameter)/2 * 0.0254 # diameter in inches, radius in meters
+        element_width = 2*wire_radius # element diameter in meters
+        folded_width = self.foldedDipoleSpacing + 2*wire_radius # driven element to far side of the folded element
+
+        # Lower limits on l1, l2, l3, d1, d2 so there are no mechanical interference problems
+        min_limits = np.array([element_width, element_width, element_width, element_width+0.0001, folded_width+0.0001])
+        max_limits = np.array([element_width, element_width, element_width, element_width+0.0002, folded_width+0.0002])
+
+        mins = np.maximum(np.array([0.75, 0.75, 0.75, 0.5, 0.5]) * self._initial, min_limits)
+        maxs = np.maximum(np.array([1.25, 1.25, 1.25, 1.5, 1.5]) * self._initial, max_limits)
+        self._bounds = np.column_stack([mins, maxs])
+    #################################################################
+
+
     #################################################################
     ####  This method handles the folded dipole check box
     ####  Changes the spacing to meters (or zero if not used)
@@ -327,7 +1018,6 @@ class uiMainWindow(QMainWindow):
     #####################################################################
     def initializePlot(self):
         self.design_freq_mhz = self.designFrq # The frequency of interest (in MHz)
-        wavelength = 299792e3/(self.design_freq_mhz*1000000)
 
         self.start_frq = self.plotFrqMin # min frequency for freq range plots
         self.stop_frq  = self.plotFrqMax # max frequency for freq range plots (inclusive)
@@ -336,21 +1026,15 @@ class uiMainWindow(QMainWindow):
         self.start_frq_opt = self.optFrqStrt # start of optimization freq range
         self.stop_frq_opt = self.optFrqStop  # end of optimization freq range (inclusive)
         self.step_frq_opt = self.optFrqStep # frequncy steps for optimization calculation
-        '''
-        initial_l1  = 1.05 * self.wavelength / 2 # reflector length initial guess .989
-        initial_l2  = 0.98 * self.wavelength / 2 # driven element length initial guess .946
-        initial_l3  = 0.88 * self.wavelength / 2 # director length initial guess .88
-        initial_d1  = 0.60 * self.wavelength / 4 # distance reflector to driven element initial guess
-        initial_d2  = 0.50 * self.wavelength / 4 # distance driven element to director initial guess
-        '''
-        initial_l1  = 0.487 * wavelength # reflector length initial guess 
-        initial_l2  = 0.437 * wavelength # driven element length initial guess 
-        initial_l3  = 0.450 * wavelength # director length initial guess 
-        initial_d1  = 0.111 * wavelength # distance reflector to driven element initial guess
-        initial_d2  = 0.184 * wavelength # distance driven element to director initial guess
+
+        self.plot_freqs = self._plot_freqs # frequencies for freq range plots
+        self.opt_freqs = self._opt_freqs   # frequencies for optimization calculation
+        self.mid_frq_opt = self._mid_frq_opt # midband of the optimization freq range
+
+        initial_l1, initial_l2, initial_l3, initial_d1, initial_d2 = self._initial
 
         print("Wavelength is %0.4fm, initial geometry is L1=%0.4fm, L2=%0.4fm, L3=%0.4fm, D1=%0.4fm, D2=%0.4fm, Spc=%0.4fm" % 
-              (wavelength, initial_l1, initial_l2, initial_l3, initial_d1, initial_d2, self.foldedDipoleSpacing))  
+              (self._wavelength, initial_l1, initial_l2, initial_l3, initial_d1, initial_d2, self.foldedDipoleSpacing))  
         
         print("\nUnoptimized antenna parameters...")
         self.show_report(initial_l1, initial_l2, initial_l3, initial_d1, initial_d2) # display results for initial guess
@@ -365,7 +1049,6 @@ class uiMainWindow(QMainWindow):
     def updatePlot(self):
 
         self.design_freq_mhz = self.designFrq # The frequency of interest (in MHz)
-        wavelength = 299792e3/(self.design_freq_mhz*1000000)
 
         self.start_frq = self.plotFrqMin # min frequency for freq range plots
         self.stop_frq  = self.plotFrqMax # max frequency for freq range plots (inclusive)
@@ -374,379 +1057,435 @@ class uiMainWindow(QMainWindow):
         self.start_frq_opt = self.optFrqStrt # start of optimization freq range
         self.stop_frq_opt = self.optFrqStop  # end of optimization freq range (inclusive)
         self.step_frq_opt = self.optFrqStep # frequncy steps for optimization calculation
+
+        self.plot_freqs = self._plot_freqs # frequencies for freq range plots
+        self.opt_freqs = self._opt_freqs   # frequencies for optimization calculation
+        self.mid_frq_opt = self._mid_frq_opt # midband of the optimization freq range
         
-        # Starting "rule of thumb" values for element lengths pre-optimization
-        '''
-        initial_l1  = 1.05 * self.wavelength / 2 # reflector length initial guess
-        initial_l2  = 0.98 * self.wavelength / 2 # driven element length initial guess
-        initial_l3  = 0.88 * self.wavelength / 2 # director length initial guess
-        initial_d1  = 0.60 * self.wavelength / 4 # distance reflector to driven element initial guess
-        initial_d2  = 0.50 * self.wavelength / 4 # distance driven element to director initial guess
-        '''
-        initial_l1  = 0.487 * wavelength # reflector length initial guess 
-        initial_l2  = 0.437 * wavelength # driven element length initial guess 
-        initial_l3  = 0.450 * wavelength # director length initial guess 
-        initial_d1  = 0.111 * wavelength # distance reflector to driven element initial guess
-        initial_d2  = 0.184 * wavelength # distance driven element to director initial guess
+        initial_l1, initial_l2, initial_l3, initial_d1, initial_d2 = self._initial
 
         print("\nOptimizing antenna...")
         self.optimizePushButton.setText('Optimizing...')
         self.optimizePushButton.setEnabled(False)
+        self.setInputsEnabled(False) # the report reads the inputs, so they must not change during the run
 
-        target = self.create_optimization_target()
-
-        # Assume that the initial guess is within +/-25% of the optimum dimensions and use as optimizatin bounds
-        wire_radius = (self.elementDiameter)/2 * 0.0254 # diameter in inches, radius in meters
         foldedDipoleSpacing = self.foldedDipoleSpacing  # distance between driven element and folded element in meters
-        if 1.5*initial_d2 <= foldedDipoleSpacing + 2*wire_radius: # max d2 interferes with folded element
-            logging.critical("ERROR: Frequency too high for folded dipole spacing of %6.3f in." % (foldedDipoleSpacing/0.0254))
-            logging.critical("       Results cannot be fully optimized")
+        wire_radius = (self.elementDiameter)/2 * 0.0254 # diameter in inches, radius in meters
+        folded_width = foldedDipoleSpacing + 2*wire_radius # driven element to far side of the folded element
+        if 1.5*initial_d2 <= folded_width: # max d2 interferes with folded element
+            logger.critical("ERROR: Frequency too high for folded dipole spacing of %6.3f in.", foldedDipoleSpacing/0.0254)
+            logger.critical("       Results cannot be fully optimized")
             QMessageBox.critical(self,"ERROR!", 
                                 "Frequency too high for folded dipole spacing of %6.3f in. \nResults cannot be fully optimized.  Exiting application." % (foldedDipoleSpacing/0.0254))
             sys.exit() # not possible to set director element far enough away. So exit.
-        elif 0.5*initial_d2 <= foldedDipoleSpacing + 2*wire_radius: # min d2 interferes with folded element, but max is ok
-            logging.warning("WARNING: Frequency too high for folded dipole spacing of %6.3f in." % (foldedDipoleSpacing/0.0254))
-            logging.warning("         Results may not be fully optimized.")
+        elif 0.5*initial_d2 <= folded_width: # min d2 interferes with folded element, but max is ok
+            logger.warning("WARNING: Frequency too high for folded dipole spacing of %6.3f in.", foldedDipoleSpacing/0.0254)
+            logger.warning("         Results may not be fully optimized.")
             QMessageBox.warning(self,"WARNING!", 
                                 "Frequency too high for folded dipole spacing of %6.3f in. \nResults may not be fully optimized." % (foldedDipoleSpacing/0.0254))
 
-        # Set minimum dimensions so there are no mechanical interference problems
-        minL1 = max(0.75*initial_l1, 2*wire_radius)
-        minL2 = max(0.75*initial_l2, 2*wire_radius)
-        minL3 = max(0.75*initial_l3, 2*wire_radius)
-        minD1 = max(0.5*initial_d1, 2*wire_radius+0.0001)
-        minD2 = max(0.5*initial_d2, foldedDipoleSpacing+2*wire_radius+0.0001)
-
-        maxL1 = max(1.25*initial_l1, 2*wire_radius)
-        maxL2 = max(1.25*initial_l2, 2*wire_radius)
-        maxL3 = max(1.25*initial_l3, 2*wire_radius)
-        maxD1 = max(1.5*initial_d1, 2*wire_radius+0.0002)
-        maxD2 = max(1.5*initial_d2, foldedDipoleSpacing+2*wire_radius+0.0002)
-
-        bounds = [ (minL1, maxL1), (minL2, maxL2), (minL3, maxL3), (minD1, maxD1), (minD2, maxD2) ]
-        
-        if self.optAlgorithm == "Gradient Descent":
-            # Use gradient descent: (finds local minimum only; Fast )
-            optimized_result = scipy.optimize.minimize(target, np.array([initial_l1, initial_l2, initial_l3, initial_d1, initial_d2]), method='Nelder-Mead', bounds=bounds)
-
-        elif self.optAlgorithm == "Diff Evolution":
-            # Use differential evolution: (Good results @ 70626 iterations)
-            optimized_result = scipy.optimize.differential_evolution(target, bounds, seed=42, disp=False, popsize=20)
-
-        elif self.optAlgorithm == "Basin Hopping":
-            # Use basin hopping: (works good. May need to adjust parameters T, step size etc.)
-            minimizer_kwargs = dict(method='Nelder-Mead')
-            optimized_result = scipy.optimize.basinhopping(target, np.array([initial_l1, initial_l2, initial_l3, initial_d1, initial_d2]), minimizer_kwargs=minimizer_kwargs, niter=10, stepsize=0.015, T=2.0, seed=42, disp=True)
-            
-        elif self.optAlgorithm == "Dual Annealing":
-            # Use Dual Annealing: 
-            minimizer_kwargs = dict(method='Nelder-Mead')
-            optimized_result = scipy.optimize.dual_annealing(target, bounds, seed=42, minimizer_kwargs=minimizer_kwargs)
-
-        elif self.optAlgorithm == "Dividing Rectangles":
-            # Use Dividing Rectangles: (Not very good with these parameters)
-            optimized_result = scipy.optimize.direct(target, bounds)
+        # Optimization bounds were derived from the initial guess in _recompute_design_constants
+        bounds = [tuple(bound) for bound in self._bounds]
+
+        # Build the initial geometry once so geometry errors are reported here, in the UI process,
+        # rather than from inside the optimization (which may be running in worker processes)
+        self.geometry_yagi(initial_l1, initial_l2, initial_l3, initial_d1, initial_d2)
+
+        x0 = self._initial.copy()
+        params = self.yagi_parameters()
+        bounds_array = self._bounds # (5, 2) array of the bounds for this run
+        algorithm = self._opt_dispatch[self.optAlgorithm]
+        patience = self._stop_patience.get(self.optAlgorithm)
+        prefilter = self.optAlgorithm not in self._sampling_algorithms
+
+        def optimize(pool, progress): # runs in the worker thread
+            target = self.create_optimization_target(params, bounds_array, pool, progress, patience, prefilter)
+            try:
+                result = algorithm(target, bounds, x0)
+            except OptimizationStopped as stop:
+                logger.info("Optimization stopped early: %s", stop)
+            else:
+                if self._bestGeometry is None: # nothing was simulated
+                    return result
+            # Report the best geometry scored, which is not always the point the algorithm ends on,
+            # and is the one simulated (see create_optimization_target) rather than the candidate
+            return scipy.optimize.OptimizeResult(x=self._bestGeometry, fun=self._bestScore)
+
+        # Run the optimization in a worker thread. The UI stays responsive and is updated via signals.
+        self._optCancelled = False
+        self._optThread = QtCore.QThread()
+        self._optWorker = OptWorker(optimize, self.optAlgorithm in self._pooled_algorithms)
+        self._optWorker.moveToThread(self._optThread)
+        self._optThread.started.connect(self._optWorker.run)
+        self._optWorker.progress.connect(self.status_label.setText)
+        self._optWorker.finished.connect(self.optimizationFinished)
+        self._optWorker.finished.connect(self._optThread.quit)
+        self._optWorker.failed.connect(self.optimizationFailed)
+        self._optWorker.failed.connect(self._optThread.quit)
+        self._optThread.start()
+    #####################################################################################
 
-        elif self.optAlgorithm == "Simplicial Homology":
-            # Use simplicial homology global optimization
-            minimizer_kwargs = dict(method='Nelder-Mead')
-            optimized_result = scipy.optimize.shgo(target, bounds, minimizer_kwargs=minimizer_kwargs)
 
-        elif self.optAlgorithm == "Brute Force":
-            # Use brute force optimization: (With Ns=10: ~100k iterations. With Ns=14: >500k iterations [Ns^5]. Takes hours)
-            ranges = (bounds[0], bounds[1],bounds[2], bounds[3], bounds[4])
-            optimized_result_brute = scipy.optimize.brute(target, ranges, full_output=True, Ns=10)
-            optimized_result = optimized_result_brute[0]
-            optimized_l1, optimized_l2, optimized_l3, optimized_d1, optimized_d2 =  optimized_result[0], optimized_result[1], optimized_result[2], optimized_result[3], optimized_result[4]
 
+    #####################################################################################
+    #### This method is called (on the UI thread) when the optimization worker is done.
+    #### Displays the report for the optimized design.
+    #####################################################################################
+    def optimizationFinished(self, optimized_result):
         print("\nOptimized antenna parameters...")
-        if self.optAlgorithm != "Brute Force": # Brute Force algorithm returns a different structure than the others.
-            optimized_l1, optimized_l2, optimized_l3, optimized_d1, optimized_d2 =  optimized_result.x[0], optimized_result.x[1], optimized_result.x[2], optimized_result.x[3], optimized_result.x[4]
+        optimized_l1, optimized_l2, optimized_l3, optimized_d1, optimized_d2 =  optimized_result.x[0], optimized_result.x[1], optimized_result.x[2], optimized_result.x[3], optimized_result.x[4]
         self.show_report(optimized_l1, optimized_l2, optimized_l3, optimized_d1, optimized_d2)
 
         self.status_label.setText("Status: Optimized Design Complete")
         #self.optimizePushButton.setStyleSheet("background-color: lightgreen") 
         self.optimizePushButton.setText('Optimize')  # Reset button label when complete
+        self.setInputsEnabled(True)
     #####################################################################################
 
 
 
+    #####################################################################################
+    #### This method is called (on the UI thread) if the optimization worker raised an
+    #### error.  Reports it and lets the user change the inputs and optimize again.
+    #####################################################################################
+    def optimizationFailed(self, error):
+        QMessageBox.critical(self, "OPTIMIZATION ERROR!", "The optimization failed:\n" + error)
+        self.status_label.setText("Status: Optimization Failed")
+        self.optimizePushButton.setText('Optimize')
+        self.optimizePushButton.setEnabled(True)
+        self.setInputsEnabled(True)
+    #####################################################################################
+
+
 
     #####################################################################################
-    # Geometry for a generic 3-element yagi parallel to the y-axis and pointing in the +x direction
-    # Yagi dimensions are defined as:
-    #     l1: length of reflector element in meters
-    #     l2: length of driven element in meters
-    #     l3: length of director element in meters
-    #     d1: distance between reflector and driven elements in meters
-    #     d1: distance between director and driven elements in meters
-    #
-    # The driven dipole is at the origin. It is a folded dipole with 5-cm spacing 
-    # Dipoles are parallel to the y axis; the driven element is centered at (0, 0, 0)
+    #### Enable or disable the design inputs (and opening a yagi file, which sets them).
+    #### They are disabled while an optimization runs.
+    #####################################################################################
+    def setInputsEnabled(self, enabled):
+        for widget in (self.groupBox_2, self.groupBox_3, self.groupBox_4, self.groupBox, self.groupBox_5,
+                       self.FoldedDipoleGroupBox, self.PolishCheckBox, self.actionOpen_Yagi_File):
+            widget.setEnabled(enabled)
     #####################################################################################
-    def geometry_yagi(self, l1, l2, l3, d1, d2):
-        wire_radius = (self.elementDiameter)/2 * 0.0254 # diameter in inches, radius in meters
-        foldedDipoleSpacing = self.foldedDipoleSpacing  # distance between driven element and folded element in meters
-        wavelength = 299792e3/(self.designFrq*1000000)
-
-        if self.elementMaterial == "Brass":
-            conductivity = 15600000 # mhos/m
-        elif self.elementMaterial == "Aluminum":
-            conductivity = 25000000 # mhos/m (6061-T6)
-        elif self.elementMaterial == "Stainless Steel":
-            conductivity = 1450000 # mhos/m
-        elif self.elementMaterial == "Copper":
-            conductivity = 57471264 # mhos/m
-        else:
-            return # should never get here (leave placeholder for additional materials)
 
-        extTWKernel = True # use extended thin wire kernel in the simulation
 
-        # calculate minimum segment length for good accuracy
-        if extTWKernel:
-            #length_segments_min = 2 * wire_radius # at non-junctions L/R>2
-            length_segments_min = 6 * wire_radius # at junctions L/R>6
-        else:
-            length_segments_min = 8 * wire_radius
 
-        # calculate maximum segment length for good accuracy
-        length_segments_max = wavelength/18 # max length per Cebik. Others use wl/10
+    #####################################################################################
+    #### Stop a running optimization before the window closes.  The target raises
+    #### OptimizationStopped at its next call, and the worker's result is dropped.
+    #####################################################################################
+    def closeEvent(self, event):
+        if self._optThread is not None and self._optThread.isRunning():
+            self._optWorker.finished.disconnect(self.optimizationFinished)
+            self._optWorker.failed.disconnect(self.optimizationFailed)
+            self._optCancelled = True
+            self._optThread.quit() # the queued quit on finished would never run while this waits
+            self._optThread.wait()
+        super().closeEvent(event)
+    #####################################################################################
 
-        # NOTE: for length_segments_min < length_segments_max,
-        #       f_mhz < 2.77777 / radius_wire
 
-        
-        # set segment length to value within NEC2 accuracy bounds 
-        if (length_segments_max > length_segments_min):
-            length_segments = math.sqrt(length_segments_max * length_segments_min) # set to geometric mean
-            #length_segments = length_segments_min # make as small as practical (slows things down at low freqs)
-        else: # This happens if freq > 1,749.8 MHz for 1/8" diameter wire, 218.7 MHz for 1" diameter (see NOTE above)
-            length_segments = length_segments_max # make as small as practical (max is smaller than min here)
-            logging.warning("GEOMETRY WARNING: Element diameter too large at this frequency. length_segments_min=%6.3f >= length_segments_max=%6.3f" %(length_segments_min, length_segments_max))
-            #QMessageBox.critical(self,"GEOMETRY ERROR!", 
-            #                    " Element diameter too large at this frequency. \n\nCannot proceed.")
-            #sys.exit()
-
-        if length_segments < wavelength/1000:  
-            length_segments = wavelength/1000 # set to minimum allowed
-            logging.critical("GEOMETRY ERROR: Wire segment length too short (less than wl/1000). Results may be invalid.")
-            QMessageBox.critical(self,"GEOMETRY ERROR!", 
-                                 "Wire segment length too short (less than wl/1000). Results may be invalid.")
-            # TODO: Maybe set length to wl/1000+.0000001 and don't exit
-            sys.exit()
-
-
-        nec = context_clean(nec_context())
-        nec.set_extended_thin_wire_kernel(extTWKernel)
-        geo = geometry_clean(nec.get_geometry())
-
-
-        # Set mnimimum dimensions to ensure geometry is valid and no mechanical interference occurs
-        # d2 must exceed (Wire diameter + foldedDipoleSpacing) to prevent mechanical interference
-        # d1 must exceed the wire diameter
-        #print ("number reflector segs = ", l1 / length_segments, l1, length_segments)
-        if (l1 < 2*length_segments) or (math.isnan(l1)): l1=2*length_segments
-        if (l2 < 2*length_segments) or (math.isnan(l2)): l2=2*length_segments
-        if (l3 < 2*length_segments) or (math.isnan(l3)): l3=2*length_segments
-        if d1 < wire_radius*2 + length_segments/1000: 
-            logging.info("geometry_yagi: d1 too small - d1=%6.3f  element dia=%6.3f" % (d1, 2*wire_radius))
-            d1 = wire_radius*2 + length_segments/1000
-        if d2 < foldedDipoleSpacing + (wire_radius*2) + length_segments/1000: 
-            logging.info("geometry_yagi: d2 too small - d2=%6.3f  element dia=%6.3f" % (d2, 2*wire_radius))
-            d2 = foldedDipoleSpacing + (wire_radius*2) + length_segments/1000
-
-
-
-        # define the elements' coordinates and parameters
-        # Note that nec tags start at 1 (not zero-indexed)
-
-        #### Reflector Element
-        nr_segments = int(l1 / length_segments)
-        if nr_segments % 2 == 0: nr_segments = nr_segments - 1 # Set to an odd number of segments (reduce segs)
-        geo.wire(tag_id=1, nr_segments=nr_segments, src=[-d1, -l1/2, 0], dst=[-d1, l1/2, 0], radius=wire_radius)
-
-        #### Driven element 
-        nr_segments = int(l2 / length_segments)  # <--- MUST make this an odd number so that source can be in center
-        if nr_segments % 2 == 0: nr_segments = nr_segments - 1 # Set to an odd number of segments (reduce segs)
-        geo.wire(tag_id=2, nr_segments=nr_segments, src=[0, -l2/2, 0], dst=[0, l2/2, 0], radius=wire_radius)
-        driver_center_seg = int(nr_segments/2) + 1
-        
-        #### Folded dipole element and connection segments
-        if self.useFoldedDipoleRadioButton.isChecked():
-            nrEndSegments = max(1, int(foldedDipoleSpacing/length_segments)) # ensure there are at minimum 1 segments
-            # Check junctions (l_seg_big/l_seg_small<5 and wire_radius1/wire_radius2<5 to avoid errors)
-            lengthEndSegments = foldedDipoleSpacing/nrEndSegments
-            if max(lengthEndSegments, length_segments)/min(lengthEndSegments, length_segments) > 5: #(Error if Lbig/Lsmall>5 at junction)
-                logging.critical("GEOMETRY ERROR: Folded dipole segment length too short at junctions. Results may be invalid.")
-                logging.critical("ratio=%6.3f  segment 1: %6.3f, segment 2: %6.3f" % 
-                    (max(lengthEndSegments, length_segments)/min(lengthEndSegments, length_segments), 
-                    length_segments, lengthEndSegments))
-                logging.critical("This error often occurs if the element radius is too large.")
-                QMessageBox.critical(self,"GEOMETRY ERROR!", 
-                                    "Folded dipole segment length too short at junctions. Results may be invalid.\n" + 
-                                    "This error often occurs if the element radius is too large.")
-                sys.exit()
-            
-            geo.wire(tag_id=4, nr_segments=nr_segments, src=[foldedDipoleSpacing, -l2/2, 0], dst=[foldedDipoleSpacing, l2/2, 0], radius=wire_radius)
-            geo.wire(tag_id=5, nr_segments=nrEndSegments, src=[0, -l2/2, 0], dst=[foldedDipoleSpacing, -l2/2, 0], radius=wire_radius)
-            geo.wire(tag_id=6, nr_segments=nrEndSegments, src=[0, l2/2, 0], dst=[foldedDipoleSpacing, l2/2, 0], radius=wire_radius)
-        
-        #### Director Element
-        nr_segments = int(l3 / length_segments)
-        if nr_segments % 2 == 0: nr_segments = nr_segments - 1 # Set to an odd number of segments (reduce segs)
-        geo.wire(tag_id=3, nr_segments=nr_segments, src=[d2, -l3/2, 0], dst=[d2, l3/2, 0], radius=wire_radius)
 
 
-        nec.set_wire_conductivity(conductivity)
-        nec.geometry_complete(ground_plane=False)
+    #####################################################################################
+    #### Collect the design inputs into a YagiParameters snapshot for the module level
+    #### simulation and scoring functions
+    #####################################################################################
+    def yagi_parameters(self):
+        return YagiParameters(designFrq=self.designFrq, elementDiameter=self.elementDiameter,
+                              elementMaterial=self.elementMaterial, foldedDipoleSpacing=self.foldedDipoleSpacing,
+                              useFoldedDipole=self.useFoldedDipoleRadioButton.isChecked(),
+                              system_impedance=self.system_impedance,
+                              opt_freqs=self.opt_freqs,
+                              vswrWeight=self.vswrWeight, fwdGainWeight=self.fwdGainWeight, fbRatioWeight=self.fbRatioWeight)
+    #####################################################################################
 
 
-        nec.voltage_excitation(wire_tag=2, segment_nr=driver_center_seg, voltage=1.0)
 
-        return nec
+    #####################################################################################
+    #### Report a geometry error to the user.  The yagi cannot be modeled, so exit.
+    #####################################################################################
+    def geometry_error(self, err):
+        QMessageBox.critical(self,"GEOMETRY ERROR!", str(err))
+        sys.exit()
     #####################################################################################
 
 
 
     #####################################################################################
-    #### Perform an NEC2 analysis on a 3-element yagi passed to this method over a range
-    #### of frequencies provided.  Returns lists of Freq, Fwd Gain, VSWR, and Rev Gain
-    #### Yagi dimensions are defined as:
-    ####     l1: length of reflector element in meters
-    ####     l2: length of driven element in meters
-    ####     l3: length of director element in meters
-    ####     d1: distance between reflector and driven elements in meters
-    ####     d1: distance between director and driven elements in meters
+    #### Build the NEC2 geometry of the yagi (see yagi_geometry)
+    #####################################################################################
+    def geometry_yagi(self, l1, l2, l3, d1, d2):
+        try:
+            return yagi_geometry(self.yagi_parameters(), l1, l2, l3, d1, d2)
+        except GeometryError as err:
+            self.geometry_error(err)
     #####################################################################################
-    def get_gain_swr_range(self, l1, l2, l3, d1, d2, start=156.0, stop=158.0, step=1.0):
-        fwd_gains = []
-        frequencies = []
-        vswrs = []
-        rev_gains = []
 
-        def frange(start, stop, step): # Using generator function to define range prevents memory problems
-            i = start
-            while i <= stop:
-                yield i
-                i += step
-    
-        for freq in frange(start, stop, step):
-        #for freq in range(start, stop + 1, step):
-            nec = self.geometry_yagi(l1, l2, l3, d1, d2) # must get new context to change freq
-            nec.set_frequency(freq) 
-            nec.radiation_pattern(thetas=Range(90, 90, count=1), phis=Range(0,360,count=2))
-            # confusingly, phi range 0..360 with count=2 produces points at 0 and 180 (step=(360-0)/2 )
-
-            rp = nec.context.get_radiation_pattern(0) 
-            ipt = nec.get_input_parameters(0)
-            z = ipt.get_impedance()
-            
-            fwd_gains.append(rp.get_gain()[0][0]) # Gain at phi = 0 degrees
-            rev_gains.append(rp.get_gain()[0][1]) # Gain at phi = 180 degrees
-            vswrs.append(vswr(z, self.system_impedance))
-            frequencies.append(ipt.get_frequency())
-            
-        return frequencies, fwd_gains, vswrs, rev_gains
+
+
+    #####################################################################################
+    #### Perform an NEC2 analysis of the yagi over a range of frequencies (see yagi_gain_swr_range)
+    #### The most recent results are cached, keyed on the geometry, the system impedance
+    #### (for the VSWR) and the frequencies.  The weights and optimization frequencies
+    #### don't change a sweep, so a design reported again after changing them reuses it.
+    #####################################################################################
+    def get_gain_swr_range(self, l1, l2, l3, d1, d2, freqs):
+        params = self.yagi_parameters()
+        key = (params.geometry_signature(), yagi_cache_key(params, (l1, l2, l3, d1, d2)),
+               params.system_impedance, tuple(freqs))
+        if key in self._sweepCache: # reports of a design already reported reuse its sweep
+            self._sweepCache.move_to_end(key)
+            return self._sweepCache[key]
+        try:
+            sweep = yagi_gain_swr_range_split(params, l1, l2, l3, d1, d2, freqs, pooled=True)
+        except GeometryError as err:
+            self.geometry_error(err)
+        self._sweepCache[key] = sweep
+        if len(self._sweepCache) > REPORT_CACHE_SIZE:
+            self._sweepCache.popitem(last=False)
+        return sweep
     #####################################################################################
 
 
     #####################################################################################
-    #### This method contains the objective function (called target).  It is used by
+    #### Get the radiation patterns of the yagi at the frequencies freqs_mhz (see yagi_pattern)
+    #### The most recent results are cached like the frequency sweeps, keyed on the geometry,
+    #### the frequency and the pattern grid.  Patterns not cached yet are
+    #### solved in parallel in the worker pool, if there is one.  Otherwise they are solved
+    #### one after the other on the geometry nec, if passed, or on one built for them.
+    #####################################################################################
+    def get_patterns(self, l1, l2, l3, d1, d2, freqs_mhz, thetas, phis, nec=None):
+        params = self.yagi_parameters()
+        geometry_key = (params.geometry_signature(), yagi_cache_key(params, (l1, l2, l3, d1, d2)))
+        keys = [geometry_key + (freq_mhz, thetas, phis) for freq_mhz in freqs_mhz]
+        missing = list(dict.fromkeys(key for key in keys if key not in self._patternCache))
+        for key in keys:
+            if key in self._patternCache:
+                self._patternCache.move_to_end(key)
+
+        pool = worker_pool() if len(missing) > 1 else None
+        try:
+            if pool is not None: # independent solves, one per worker process
+                patterns = pool.starmap(yagi_pattern, [(params, l1, l2, l3, d1, d2, key[2], thetas, phis) for key in missing])
+            else:
+                if nec is None and missing:
+                    nec = yagi_geometry(params, l1, l2, l3, d1, d2)
+                patterns = [yagi_pattern(params, l1, l2, l3, d1, d2, key[2], thetas, phis, nec) for key in missing]
+        except GeometryError as err:
+            self.geometry_error(err)
+
+        for key, (gains_db, theta_angles, phi_angles) in zip(missing, patterns):
+            # the angles only depend on the grid, so all its patterns share one copy
+            angles = self._patternAngles.setdefault((thetas, phis), (theta_angles, phi_angles))
+            self._patternCache[key] = (gains_db, *angles)
+        patterns = [self._patternCache[key] for key in keys]
+        while len(self._patternCache) > REPORT_CACHE_SIZE:
+            self._patternCache.popitem(last=False)
+        return patterns
+
+    def get_pattern(self, l1, l2, l3, d1, d2, freq_mhz, thetas, phis, nec=None):
+        return self.get_patterns(l1, l2, l3, d1, d2, [freq_mhz], thetas, phis, nec)[0]
+    #####################################################################################
+
+
+    #####################################################################################
+    #### Get the sines and cosines of the theta and phi angles of a pattern grid already
+    #### solved (see get_patterns): (sin_thetas, cos_thetas, sin_phis, cos_phis).
+    #### The grid is fixed, so they are evaluated once and kept.
+    #####################################################################################
+    def get_pattern_trig(self, thetas, phis):
+        if (thetas, phis) not in self._patternTrig:
+            theta_angles, phi_angles = self._patternAngles[thetas, phis]
+            self._patternTrig[thetas, phis] = (np.sin(theta_angles), np.cos(theta_angles),
+                                               np.sin(phi_angles), np.cos(phi_angles))
+        return self._patternTrig[thetas, phis]
+    #####################################################################################
+
+
+    #####################################################################################
+    #### This method creates the objective function (called target).  It is used by
     #### the optimization algorithm to seek the lowest score given the weights and
-    #### geometries that are iterated over.
+    #### geometries that are iterated over.  Candidates outside the optimization bounds
+    #### (a (5, 2) array of min/max) get a penalty score without being simulated, as do
+    #### (if prefilter) candidates with an off-resonance driven element.
+    #### If a multiprocessing pool is passed, the
+    #### target also accepts a (5, S) array of S candidate geometries (one per column,
+    #### as passed by differential_evolution with vectorized=True) and scores them in
+    #### parallel in the pool's worker processes.  If a progress callable is passed
+    #### (the target is running in the optimization worker thread), status text is sent
+    #### to it rather than written to the status label.
+    #### The best score and the geometry simulated for it (the cache key, not the
+    #### candidate) are kept in _bestScore/_bestGeometry.  If patience is passed, the target
+    #### raises OptimizationStopped once that many iterations pass without improving it.
     #####################################################################################
-    def create_optimization_target(self):
+    def create_optimization_target(self, params, bounds, pool=None, progress=None, patience=None, prefilter=True):
         global iteration_count 
         iteration_count = 0
 
-        global sampledResults, sampledL1, sampledL2, sampledL3, sampledD1, sampledD2
-        sampledResults = []
-        sampledL1 = []
-        sampledL2 = []
-        sampledL3 = []
-        sampledD1 = []
-        sampledD2 = []
-
+        self._bestScore = np.inf
+        self._bestGeometry = None
+        best_iteration = [0] # iteration_count when the best score was found
 
-        # Objective function to calculate a score to be minimized by the optimization algorithms.
-        # This procedure is called iteratively by the sciPy minimization procedures to search for 
-        # a global minimum of the objective function calculated for variables: Fwd gain, VSWR, Rev Gain
-        def target(args):
-            l1, l2, l3, d1, d2 = args
+        self._trace = np.empty((4096, 6), dtype=np.float32) # grown as needed in record()
 
-            elementDiameterMeters = self.elementDiameter * 0.0254
-            foldedDipoleSpacing = self.foldedDipoleSpacing  # distance between driven element and folded element in meters
 
-            # Check that dimensions are valid and no mechanical interference problems
-            if l1<elementDiameterMeters or l2<elementDiameterMeters or l3<elementDiameterMeters or d1<=elementDiameterMeters or d2<=foldedDipoleSpacing+elementDiameterMeters:
-                logging.warning("TARGET WARNING: Geometry dimensions out of range l1=%6.3f l2=%6.3f, l3=%6.3f, d1=%6.3f d2=%6.3f" % (l1, l2, l3, d1, d2))
-                return float('inf')            
-            if math.isnan(l1) or math.isnan(l2) or math.isnan(l3) or math.isnan(d1) or math.isnan(d2):
-                logging.warning("TARGET WARNING: Geometry dimensions invalid (NaN) l1=%6.3f l2=%6.3f, l3=%6.3f, d1=%6.3f d2=%6.3f" % (l1, l2, l3, d1, d2))
-                return float('inf')
-            
-            try: # simulate yagi and return the parameters
-                freqs, gains, vswrs, rev_gains = self.get_gain_swr_range(l1, l2, l3, d1, d2, 
-                                                                         start=self.start_frq_opt, stop=self.stop_frq_opt, 
-                                                                         step=self.step_frq_opt)
-            except RuntimeError as err: # Usually a geometry error occured if we get here
-                logging.warning("TARGET WARNING: Exception while calculating optimization score: %s" % (err))
-                logging.warning("l1=%6.3f l2=%6.3f, l3=%6.3f, d1=%6.3f d2=%6.3f diameter=%6.3f" % (l1, l2, l3, d1, d2, elementDiameterMeters))
-                return float('inf')
-            
+        progress_interval = 25 # iterations between progress updates
 
-            # Calculate a score for VSWR, Fwd Gain and Rev Gain over the optimization freq range
-            result = 0
-            vswr_score = 0
-            gains_score = 0
-            rev_gains_score = 0
-            for gain in gains:
-                gains_score += gain     # gain values are in dBi
-            for vswr in vswrs:
-                #if vswr >= 1.8:         # invoke a severe penalty when VSWR 
-                #    vswr = np.exp(vswr) # exceeds 1.8 within the freq ranges :)
-                vswr_score += vswr
-            for rev_gain in rev_gains:
-                if rev_gain > -30:   # shoot for f/b of around 30 (no improvement to score if less)
-                    rev_gains_score += rev_gain
-                #rev_gains_score += rev_gain
-
-            # Calculate an objective function to be minimized based on the scores
-            #    * VSWR should minimal, gains maximal, front-to-back minimal
-            #    * "result" variable decreases as these criteria are met
-            #    * Note that each contributer is weighted so that each carries appr. equal contribution
-            result = self.vswrWeight*vswr_score - self.fwdGainWeight*gains_score + self.fbRatioWeight*(rev_gains_score - gains_score)
-
-            # experiment with alternative objective function scoring system that goes very negative 
-            # when all 3 objectives near target simultaneously
-            #  --- Gives worse result, and with 3X the iterations (26,126)
-            #num_frqs = (stop_frq_opt-start_frq_opt)/step_frq_opt + 1
-            #result = -1/((vswr_score-num_frqs) + (-gains_score + 9.5*num_frqs) + (rev_gains_score + 30*num_frqs))
+        # Record a scored geometry for the optimization map and show progress.  args is the
+        # geometry actually simulated (the cache key, see cached_scores), not the candidate.
+        # Always runs in the main process, even if the score was calculated in a worker process.
+        def record(args, score):
+            result, gain, rev_gain, vswr = score
+            if gain is None: # invalid geometry, nothing simulated
+                return result
 
+            l1, l2, l3, d1, d2 = args
 
             # These variables are used to create an optimization path map.
             # Since it is only 3 dimensions, can only select two parameters to map 
-            global sampledResults, sampledL1, sampledL2, sampledL3, sampledD1, sampledD2
-            sampledL1.append(l1)
-            sampledL2.append(l2)
-            sampledL3.append(l3)
-            sampledD1.append(d1)
-            sampledD2.append(d2)
-            sampledResults.append(result)
-
-            # Bump the iteration counter and display feedback to user on optimization progress
-            global iteration_count 
+            global iteration_count
+            if iteration_count == len(self._trace): # trace is full, double it
+                self._trace = np.concatenate([self._trace, np.empty_like(self._trace)])
+            self._trace[iteration_count] = (l1, l2, l3, d1, d2, result)
+            if result < self._bestScore:
+                self._bestScore = result
+                self._bestGeometry = np.array(args, dtype=float)
+                best_iteration[0] = iteration_count
+
+            # Bump the iteration counter and display feedback to user on optimization progress.
+            # Only every progress_interval'th iteration, as updating the UI costs more than a cached score.
             iteration_count += 1            
+            if (iteration_count - 1) % progress_interval != 0:
+                return result
             if vswr>1.8: # print correct vswr if severe penalty applied
                 #statusText = ("Iteration:%5d   Fwd Gain=%6.2f  Rev Gain=%6.2f VSWR=%6.2f  Score=%6.1f     args=%5.3f, %5.3f, %5.3f, %5.3f, %5.3f" % (iteration_count, gain, rev_gain, np.log(vswr), min(result, 999.9), l1, l2, l3, d1, d2))
-                statusText = ("Iteration:%5d  Fwd Gain=%6.2f  Rev Gain=%6.2f VSWR=%6.2f  Score=%6.1f   args=%5.3f, %5.3f, %5.3f, %5.3f, %5.3f, %5.3f" % (iteration_count, gain, rev_gain, vswr, min(result, 999.9), l1, l2, l3, d1, d2, foldedDipoleSpacing))            
+                statusText = ("Iteration:%5d  Fwd Gain=%6.2f  Rev Gain=%6.2f VSWR=%6.2f  Score=%6.1f   args=%5.3f, %5.3f, %5.3f, %5.3f, %5.3f, %5.3f" % (iteration_count, gain, rev_gain, vswr, min(result, 999.9), l1, l2, l3, d1, d2, params.foldedDipoleSpacing))            
+            else:
+                statusText = ("Iteration:%5d  Fwd Gain=%6.2f  Rev Gain=%6.2f VSWR=%6.2f  Score=%6.1f   args=%5.3f, %5.3f, %5.3f, %5.3f, %5.3f, %5.3f" % (iteration_count, gain, rev_gain, vswr, min(result, 999.9), l1, l2, l3, d1, d2, params.foldedDipoleSpacing))            
+            if progress is not None: # running in the worker thread: hand the text to the UI thread
+                progress(statusText)
             else:
-                statusText = ("Iteration:%5d  Fwd Gain=%6.2f  Rev Gain=%6.2f VSWR=%6.2f  Score=%6.1f   args=%5.3f, %5.3f, %5.3f, %5.3f, %5.3f, %5.3f" % (iteration_count, gain, rev_gain, vswr, min(result, 999.9), l1, l2, l3, d1, d2, foldedDipoleSpacing))            
-            print(statusText, end="\r")
-            self.status_label.setText(statusText)
-            QApplication.processEvents()  ########## Give UI opportunity to update -- can use threading instead) ######
+                self.status_label.setText(statusText)
+                QApplication.processEvents()  ########## Give UI opportunity to update ######
             
             return result # return result of objective function to calling procedure
+
+
+        # Least recently used cache of scores keyed on the geometry (see yagi_cache_key).
+        # Global searches (Brute Force, Dividing Rectangles, the initial DE population) and
+        # the simplex steps of the local searches revisit geometries that simulate identically.
+        # The cache is kept on the window, so later runs with the same inputs (e.g. trying
+        # another algorithm) reuse the scores.  It is started over when any input changes.
+        if self._scoreCacheSignature != params.signature():
+            self._scoreCache = collections.OrderedDict()
+            self._scoreCacheSignature = params.signature()
+            self._badGeometries = np.empty((0, 5)) # see nearest_bad_score
+            self._badScores = []
+        score_cache = self._scoreCache
+        score_cache_size = 8192
+
+        min_bounds, max_bounds = bounds[:, 0], bounds[:, 1]
+
+        # A driven element this far from a half wave is well off resonance (the VSWR is
+        # very high), so it is given a penalty (growing linearly with the distance outside)
+        # without being simulated.  Neither this nor the known-bad reuse below is done without
+        # prefilter (the sampling algorithms): the limits cut off about a third of the l2 bounds,
+        # and the samples (and a surrogate fitted to them) need real scores across all of it.
+        if prefilter:
+            driven_min, driven_max = 0.4*params.wavelength, 0.6*params.wavelength
+        else:
+            driven_min, driven_max = -np.inf, np.inf
+
+        # Scored geometries with a VSWR above bad_vswr are kept.  A geometry within bad_radius
+        # (the wl/1000 segment accuracy floor) of one of them is given its score without
+        # being simulated, as the score could only differ by a little.
+        bad_vswr = 3.0
+        bad_radius = params.wavelength / 1000
+        bad_size = score_cache_size # the most recent bad geometries are kept
+
+        def nearest_bad_score(key):
+            if not prefilter or not self._badScores:
+                return None
+            distances = np.linalg.norm(self._badGeometries - key, axis=1)
+            nearest = np.argmin(distances)
+            return self._badScores[nearest] if distances[nearest] < bad_radius else None
+
+        # Returns the scores of the candidates and the geometries that were scored for them.
+        # A simulated candidate is scored as its cache key (clamped and snapped to the key grid),
+        # and the score can jump across threshold lines in the cost (e.g. the -30 dB rev gain)
+        # between the two, so the key is what has to be recorded and reported.
+        def cached_scores(candidates):
+            scores = [None] * len(candidates)
+            geometries = list(candidates)
+            keys = {}
+            for i, candidate in enumerate(candidates):
+                if not np.all(np.isfinite(candidate)): # NaN would pass through the penalties below (and NaN scores break the algorithms)
+                    yagi_dimensions_valid(params, candidate) # logs the invalid dimensions
+                    scores[i] = (float('inf'), None, None, None)
+                    continue
+                clipped = np.clip(candidate, min_bounds, max_bounds)
+                if np.any(clipped != candidate): # outside the bounds: penalty grows with the distance outside
+                    scores[i] = (1e6 + np.sum((candidate - clipped)**2), None, None, None)
+                    continue
+                if not driven_min <= candidate[1] <= driven_max:
+                    scores[i] = (1e4 + 1e6*max(driven_min - candidate[1], candidate[1] - driven_max)/params.wavelength,
+                                 None, None, None)
+                    continue
+                if not yagi_dimensions_valid(params, candidate):
+                    scores[i] = (float('inf'), None, None, None)
+                    continue
+                key = yagi_cache_key(params, candidate)
+                geometries[i] = np.array(key)
+                if key in score_cache:
+                    score_cache.move_to_end(key)
+                    scores[i] = score_cache[key]
+                    continue
+                bad_score = nearest_bad_score(key)
+                if bad_score is not None:
+                    scores[i] = bad_score
+                else:
+                    keys.setdefault(key, []).append(i)
+
+            missing = list(keys)
+            if pool is not None and len(missing) > 1:
+                new_scores = pool.map(functools.partial(yagi_score, params), missing)
+            else: # one at a time, but a long sweep is split over the worker processes
+                new_scores = [yagi_score(params, key, pooled=True) for key in missing]
+
+            for key, score in zip(missing, new_scores):
+                score_cache[key] = score
+                if len(score_cache) > score_cache_size:
+                    score_cache.popitem(last=False)
+                for i in keys[key]:
+                    scores[i] = score
+
+            bad = [(key, score) for key, score in zip(missing, new_scores) if score[3] is not None and score[3] > bad_vswr]
+            if bad:
+                self._badGeometries = np.vstack([self._badGeometries] + [key for key, score in bad])[-bad_size:]
+                self._badScores = (self._badScores + [score for key, score in bad])[-bad_size:]
+            return scores, geometries
+
+
+        # Objective function to calculate a score to be minimized by the optimization algorithms.
+        # This procedure is called iteratively by the sciPy minimization procedures to search for 
+        # a global minimum of the objective function calculated for variables: Fwd gain, VSWR, Rev Gain
+        def check_stop():
+            if self._optCancelled:
+                raise OptimizationStopped("cancelled")
+            if patience is not None and iteration_count - best_iteration[0] > patience:
+                raise OptimizationStopped("no improvement in %d iterations" % patience)
+
+        def target(args):
+            args = np.asarray(args)
+            if args.ndim == 2: # vectorized call: score each column (candidate geometry), in the pool if there is one
+                scores, geometries = cached_scores(list(args.T))
+                results = np.array([record(geometry, score) for geometry, score in zip(geometries, scores)])
+            else:
+                scores, geometries = cached_scores([args])
+                results = record(geometries[0], scores[0])
+            check_stop()
+            return results
         
         return target # returns the name of the scoring procedure to be used
     #####################################################################################
@@ -768,38 +1507,210 @@ class uiMainWindow(QMainWindow):
 
 
     #####################################################################################
-    #### Draw vertical lines at the start and stop optimization frequencies
+    #### Draw vertical lines at the start and stop optimization frequencies.  The lines
+    #### are kept so update_frequency_ranges can move them for later reports.
     #####################################################################################
     def draw_frequency_ranges(self, ax):
-        ax.axvline(x=self.start_frq_opt, color='red', linewidth=1, label="Min Frq")
-        ax.axvline(x=self.stop_frq_opt, color='red', linewidth=1, label="Max Frq")
+        self.frequencyRangeLines.append((ax.axvline(x=self.start_frq_opt, color='red', linewidth=1, label="Min Frq"),
+                                         ax.axvline(x=self.stop_frq_opt, color='red', linewidth=1, label="Max Frq")))
+
+    def update_frequency_ranges(self):
+        for start_line, stop_line in self.frequencyRangeLines:
+            start_line.set_xdata([self.start_frq_opt, self.start_frq_opt])
+            stop_line.set_xdata([self.stop_frq_opt, self.stop_frq_opt])
     #####################################################################################
 
 
 
 
     #####################################################################################
-    #### Simulate the antenna and plot the results 
+    #### Label the y axis of a report plot every major units, with solid major and dotted
+    #### minor gridlines.  Tickers hold a reference to their axis, so each axis gets its own.
+    #####################################################################################
+    def apply_grid(self, ax, major, minor):
+        ax.yaxis.set_major_locator(mpl.ticker.MultipleLocator(major))
+        ax.yaxis.set_major_formatter(mpl.ticker.FormatStrFormatter('%d'))
+        ax.yaxis.set_minor_locator(mpl.ticker.MultipleLocator(minor))
+        ax.yaxis.set_minor_formatter(mpl.ticker.NullFormatter())
+        ax.yaxis.grid(True, which='minor', color='0.6', linestyle='dotted')
+        ax.yaxis.grid(True, which='major', color='0.6', linestyle='solid')
+        ax.grid(True)
     #####################################################################################
-    def show_report(self, l1, l2, l3, d1, d2):   
-        Omega = "\u2126"
-        ohm = ' %s' % Omega
 
-        #### Plot 2-D elevation/azimuth patterns at the theta/phi cuts that include the max gain 
-        def plot_pattern_2d(gains_db, thetas, phis, subplot_num, line = "solid", label = None): 
-            max_idx = np.unravel_index(np.argmax(gains_db, axis=None), gains_db.shape) # find indices of the max gain_db element
-            max_gain = gains_db[max_idx]
-            max_theta = thetas[max_idx[0]]
-            max_phi = phis[max_idx[1]]
 
-            ax = plt.subplot(subplot_num, polar=True)
-            ax.plot(thetas, gains_db[ :, max_idx[1]], color='b', linewidth=1, linestyle=line, label="Elevation Pattern at "+label)  # el pattern at az of max gain
-            ax.plot(phis, gains_db[max_idx[0], : ], color='r', linewidth=1, linestyle=line, label="Azimuth Pattern at "+label) # az pattern at el of max gain
 
+
+    #####################################################################################
+    #### Create the report plots (axes, titles, grids and empty lines) once.  show_report
+    #### updates the data of these artists in place rather than rebuilding the figure.
+    #####################################################################################
+    def create_report_plots(self):
+        figure = self.main_figure.figure
+        figure.clear()  # Clears plots, titles and gridlines, etc. 
+        figure.subplots_adjust(wspace=0.5, hspace=0.85)
+        self.frequencyRangeLines = []
+
+        #### Plot gains vs frequency 
+        ax = self.gainAxes = figure.add_subplot(221)
+        self.fwdGainLine, = ax.plot([], [], label="Forward Gain (dBi)")
+        self.revGainLine, = ax.plot([], [], linestyle='dotted', label="Reverse Gain (dBi)")
+        self.draw_frequency_ranges(ax)
+
+        ax.set_title("Gain - 3-element Yagi", fontsize=10)
+        ax.set_xlabel("Frequency (MHz)")
+        ax.set_ylabel("Boresight Gain (dBi)")
+
+        self.apply_grid(ax, 1, 0.5)
+        
+
+        #### Plot vswrs vs frequency 
+        ax = self.vswrAxes = figure.add_subplot(222)
+        self.vswrLine, = ax.plot([], [], label="VSWR")
+        self.draw_frequency_ranges(ax)
+
+        ax.set_yscale("log")
+        ax.set_title("VSWR - 3-element Yagi", fontsize=10)
+        ax.set_xlabel("Frequency (MHz)")
+        ax.set_ylabel("VSWR")
+
+        ax.set_ylim(1, 6)
+
+        self.apply_grid(ax, 1, 0.5)
+
+
+        #### Plot the radiation pattern at the design frequency
+        if self.plot_3d:
+            ax = self.patternAxes = figure.add_subplot(223, projection='3d')
+            ax.set_xlabel('X', fontsize=8)
+            ax.set_ylabel('Y', fontsize=8)
+            ax.set_zlabel('Z', fontsize=8)
+            ax.set_xticklabels([])
+            ax.set_yticklabels([])
+            ax.set_zticklabels([])
+            #ax.format_coord = lambda x, y: '' # suppress display of az/el of plot
+            ax.set_title("3-D Pattern - 3-element Yagi",  va='bottom', fontsize=10)  
+        else:
+            ax = self.patternAxes = figure.add_subplot(223, polar=True)
             ax.set_thetalim(-np.pi, np.pi)
             ax.set_thetagrids(np.linspace(-180,  180, 24, endpoint=False), fontsize=6)
             ax.set_theta_zero_location("N") # theta is zero due north
             ax.set_theta_direction(-1) # theta increases going clockwise
+            ax.grid(True)
+            ax.set_title("Gain patterns at az/el of max gain", va='bottom', fontsize=10)
+        self.patternSurface = None # 3-D pattern surface of the latest report
+        self.patternLines = {}     # 2-D elevation/azimuth pattern lines, keyed by label
+
+
+        #### F/B vs frequency until there is an optimization map to show (see show_report)
+        self.fbMapAxes = None
+        self.create_fb_plot()
+    #####################################################################################
+
+
+
+
+    #####################################################################################
+    #### Create the F/B vs frequency plot in slot (224)
+    #####################################################################################
+    def create_fb_plot(self):
+        self.remove_fb_map_plot()
+        ax = self.fbMapAxes = self.main_figure.figure.add_subplot(224)
+        self.fbLine, = ax.plot([], [], label="F/B Ratio (dB)")
+        self.draw_frequency_ranges(ax)
+
+        ax.set_title("F/B - 3-element Yagi", fontsize=10)
+        ax.set_xlabel("Frequency (MHz)")
+        ax.set_ylabel("F/B Ratio (dB)")
+
+        #yMaxLimit = math.ceil(min(40, math.ceil(max(f_to_b)))/5) * 5 # Set upper limit to the 5 dB value >= the max F/B
+        #ax.set_ylim(yMaxLimit-40, yMaxLimit)                         #  but cap at 40 dB with 40 dB range
+        ax.set_ylim(0, 40)                    
+
+        self.apply_grid(ax, 10, 5)
+        self.mapScatter = None
+    #####################################################################################
+
+
+
+
+    #####################################################################################
+    #### Create the optimization map in slot (224).  Useful to test whether the 
+    #### optimization bounds are capturing the best point.
+    #####################################################################################
+    def create_map_plot(self):
+        self.remove_fb_map_plot()
+        #norm = mpl.colors.Normalize(vmin=min(sampledResults), vmax=max(sampledResults))
+        norm = mpl.colors.Normalize(vmin=-200, vmax=-150, clip=True)
+        cmap = mpl.cm.cool
+
+        ax = self.fbMapAxes = self.main_figure.figure.add_subplot(224)
+        self.mapScatter = ax.scatter([], [], c=[], cmap=cmap, norm=norm, edgecolors='face', alpha=0.25) # L3/D2, L3/D1, L3/L2 and L1/L2
+        ax.set_title("Optimization path", fontsize=10)
+        ax.set_xlabel("Director Length (m)")
+        ax.set_ylabel("Director Distance (m)")
+        self.mapColorbar = self.main_figure.figure.colorbar(mpl.cm.ScalarMappable(norm=norm, cmap=cmap), ax=ax)
+        ax.grid(True)
+    #####################################################################################
+
+
+
+
+    #####################################################################################
+    #### Remove the plot in slot (224), with its frequency range lines and colorbar
+    #####################################################################################
+    def remove_fb_map_plot(self):
+        if self.fbMapAxes is None:
+            return
+        if self.mapScatter is not None:
+            self.mapColorbar.remove()
+        self.frequencyRangeLines = [lines for lines in self.frequencyRangeLines if lines[0].axes is not self.fbMapAxes]
+        self.fbMapAxes.remove()
+        self.fbMapAxes = None
+    #####################################################################################
+
+
+
+
+    #####################################################################################
+    #### Called by the report cursor when it hovers over an artist: label the annotation
+    #####################################################################################
+    @staticmethod
+    def onCursorAdd(sel):
+        sel.annotation.set_text(sel.artist.get_label())
+    #####################################################################################
+
+
+
+
+    #####################################################################################
+    #### Simulate the antenna and plot the results 
+    #####################################################################################
+    def show_report(self, l1, l2, l3, d1, d2):   
+        Omega = "\u2126"
+        ohm = ' %s' % Omega
+
+        #### Plot 2-D elevation/azimuth patterns at the theta/phi cuts that include the max gain 
+        def plot_pattern_2d(gains_db, thetas, phis, line = "solid", label = None): 
+            # The max is taken from the solved gains.  The interpolated ones only smooth the plotted
+            # cuts: they can overshoot, and tip a tie between twin lobes the other way.
+            flat = gains_db.ravel()
+            idx = flat.argmax()
+            i, j = divmod(idx, gains_db.shape[1]) # theta/phi indices of the max gain_db element
+            max_gain = flat[idx]
+            max_theta = thetas[i]
+            max_phi = phis[j]
+            gains_db, thetas, phis = pattern_zoom(gains_db, thetas, phis, REPORT_PATTERN_2D_ZOOM)
+            i, j = i*REPORT_PATTERN_2D_ZOOM, j*REPORT_PATTERN_2D_ZOOM # the same angles on the interpolated grid
+
+            ax = self.patternAxes
+            if label not in self.patternLines:
+                self.patternLines[label] = (
+                    ax.plot([], [], color='b', linewidth=1, linestyle=line, label="Elevation Pattern at "+label)[0],
+                    ax.plot([], [], color='r', linewidth=1, linestyle=line, label="Azimuth Pattern at "+label)[0])
+            el_line, az_line = self.patternLines[label]
+            el_line.set_data(thetas, gains_db[ :, j])  # el pattern at az of max gain
+            az_line.set_data(phis, gains_db[i, : ]) # az pattern at el of max gain
+
             perimeter = math.ceil(max_gain/5) * 5 # set the perimeter to the 5 dB value >= the max gain
             #perimeter = max_gain
             center = perimeter - 40
@@ -807,8 +1718,6 @@ class uiMainWindow(QMainWindow):
             #ax.set_rgrids(np.linspace(center, perimeter, 5, endpoint=False), angle=0, fontsize=6) 
             #ax.set_rgrids([perimeter-50, perimeter-40, perimeter-30, perimeter-20, perimeter-15, perimeter-10, perimeter-6, perimeter-3, perimeter], angle=0, fontsize=6) 
             ax.set_rgrids([perimeter-40, perimeter-30, perimeter-20, perimeter-10, perimeter], angle=0, fontsize=6) 
-            ax.grid(True)
-            ax.set_title("Gain patterns at az/el of max gain", va='bottom', fontsize=10)
 
             return max_gain, max_theta, max_phi
         
@@ -816,7 +1725,7 @@ class uiMainWindow(QMainWindow):
         #### Plot Plot 3-D representation of the antenna pattern
         # TODO: Figure out why i get a pick support warning. I think it is mplcursors related. 
         #       Need to turn it off when hovering over 3D plot?)
-        def plot_pattern_3d(gains_db, thetas, phis, subplot_num, scaling = "ARRL"): 
+        def plot_pattern_3d(gains_db, thetas, phis, trig, scaling = "ARRL"): 
 
             ### Function used by 3-D pattern plotting code to center surface plot on axes
             ### Adapted from plot-antenna.py authored by Ralf Schlatterbeck
@@ -858,45 +1767,37 @@ class uiMainWindow(QMainWindow):
 
 
             # Get parameters associated with the max gain coordinates
-            max_idx = np.unravel_index(np.argmax(gains_db, axis=None), gains_db.shape) # find indices of the max gain_db element
-            max_gain = gains_db[max_idx]
-            max_theta = thetas[max_idx[0]]
-            max_phi = phis[max_idx[1]]            
+            flat = gains_db.ravel()
+            idx = flat.argmax()
+            i, j = divmod(idx, gains_db.shape[1]) # theta/phi indices of the max gain_db element
+            max_gain = flat[idx]
+            max_theta = thetas[i]
+            max_phi = phis[j]
 
             if scaling == "Linear":
-                gains = 10.0**((gains_db - gains_db.max()) / 10.0) # Linear Scaling
+                gains = 10.0**((gains_db - max_gain) / 10.0) # Linear Scaling
             if scaling == "ARRL":
-                gains = (1 / 0.89) ** ((gains_db - gains_db.max()) / 2) # ARRL scaling
-
-            n_phis, n_thetas = np.meshgrid(phis, thetas)
+                gains = (1 / 0.89) ** ((gains_db - max_gain) / 2) # ARRL scaling
 
             # convert from polar to cartesian coords.
-            X = gains * np.sin(n_thetas) * np.cos(n_phis)
-            Y = gains * np.sin(n_thetas) * np.sin(n_phis)
-            Z = gains * np.cos(n_thetas)
-            V = np.sqrt(X**2 + Y**2 + Z**2)
+            X, Y, Z = pattern_to_xyz(gains, *trig) # trig: sines and cosines of the angles (see get_pattern_trig)
+            V = gains # the length of (X, Y, Z), as the gains are positive
 
             # Assign colors corresponding to vector length V
             norm = mpl.colors.Normalize(vmin=V.min().min(), vmax=V.max().max())
             mycolors = mpl.cm.rainbow(norm(V)) 
 
-            # Plot the surface
-            ax = plt.subplot(subplot_num, projection='3d')
+            # Plot the surface (replacing the surface of the previous report)
+            ax = self.patternAxes
+            if self.patternSurface is not None:
+                self.patternSurface.remove()
             rc, cc = gains.shape
-            ax.plot_surface(X, Y, Z, rcount=rc, ccount=cc, facecolors=mycolors, shade=False)    
+            self.patternSurface = ax.plot_surface(X, Y, Z, rcount=rc, ccount=cc, facecolors=mycolors, shade=False)    
 
             xr, yr, zr = scene_ranges((X, Y, Z)) # center surface plot on cartesian axes
             ax.set_xlim(xr)
             ax.set_ylim(yr)
             ax.set_zlim(zr)
-            ax.set_xlabel('X', fontsize=8)
-            ax.set_ylabel('Y', fontsize=8)
-            ax.set_zlabel('Z', fontsize=8)
-            ax.set_xticklabels([])
-            ax.set_yticklabels([])
-            ax.set_zticklabels([])
-            #ax.format_coord = lambda x, y: '' # suppress display of az/el of plot
-            ax.set_title("3-D Pattern - 3-element Yagi",  va='bottom', fontsize=10)  
 
             return max_gain, max_theta, max_phi
 
@@ -912,76 +1813,44 @@ class uiMainWindow(QMainWindow):
         nec = self.geometry_yagi(l1, l2, l3, d1, d2)
         freq_mhz = self.design_freq_mhz
         z = self.simulate_and_get_impedance(nec, freq_mhz) # gets impedance results at freq of interest
+        z_vswr = sweep_vswrs(np.asarray(z, dtype=complex), float(self.system_impedance))[0]
         print("Impedance: (%0.2f,%+0.2fj)%s @ %0.2f MHz" % (z.real[0], z.imag[0], Omega, freq_mhz))
-        print("VSWR @ %0.1f%s is %5.2f @ %0.2f MHz" % (self.system_impedance,Omega, vswr(z, self.system_impedance), freq_mhz))
+        print("VSWR @ %0.1f%s is %5.2f @ %0.2f MHz" % (self.system_impedance,Omega, z_vswr, freq_mhz))
 
         #### Run simulation and get vswrs & gains over the start/stop range of freqs
-        nec = self.geometry_yagi(l1, l2, l3, d1, d2)
-        freqs, fwd_gains, vswrs, rev_gains = self.get_gain_swr_range(l1, l2, l3, d1, d2, start=self.start_frq, stop=self.stop_frq, step=self.step_frq)
-        freqs = np.array(freqs) / 1000000 # In MHz
+        freqs, fwd_gains, vswrs, rev_gains = self.get_gain_swr_range(l1, l2, l3, d1, d2, self.plot_freqs)
+        freqs = freqs / 1000000 # In MHz
 
 
-        # Prepare plotting area
-        self.main_figure.figure.clear()  # Clears plots, titles and gridlines, etc. 
-        plt.subplots_adjust(wspace=0.5, hspace=0.85)  
+        # Create the plots the first time.  Later reports update them in place
+        if self.gainAxes is None:
+            self.create_report_plots()
+        self.update_frequency_ranges()
 
         #### Plot gains vs frequency 
-        ax = plt.subplot(221)
-        ax.plot(freqs, fwd_gains, label="Forward Gain (dBi)")
-        ax.plot(freqs, rev_gains, linestyle='dotted', label="Reverse Gain (dBi)")
-        self.draw_frequency_ranges(ax)
+        ax = self.gainAxes
+        self.fwdGainLine.set_data(freqs, fwd_gains)
+        self.revGainLine.set_data(freqs, rev_gains)
+        ax.relim()
+        ax.autoscale_view()
 
-        ax.set_title("Gain - 3-element Yagi", fontsize=10)
-        ax.set_xlabel("Frequency (MHz)")
-        ax.set_ylabel("Boresight Gain (dBi)")
-
-        yMaxLimit = math.ceil(max(fwd_gains)/5) * 5
+        yMaxLimit = math.ceil(fwd_gains.max()/5) * 5
         ax.set_ylim(yMaxLimit-10, yMaxLimit) # Set upper limit to the 5 dB value >= the max gain with 10 dB range
-
-        majorLocator = mpl.ticker.MultipleLocator(1)
-        majorFormatter = mpl.ticker.FormatStrFormatter('%d')
-        minorLocator = mpl.ticker.MultipleLocator(0.5)
-        minorFormatter = mpl.ticker.FormatStrFormatter('')
-        ax.yaxis.set_major_locator(majorLocator)
-        ax.yaxis.set_major_formatter(majorFormatter)
-        ax.yaxis.set_minor_locator(minorLocator)
-        ax.yaxis.set_minor_formatter(minorFormatter)
-        ax.yaxis.grid(True, which='minor', color='0.6', linestyle='dotted')
-        ax.yaxis.grid(True, which='major', color='0.6', linestyle='solid')
-        ax.grid(True)
         
 
         #### Plot vswrs vs frequency 
-        ax = plt.subplot(222)
-        ax.plot(freqs, vswrs, label="VSWR")
-        self.draw_frequency_ranges(ax)
-
-        ax.set_yscale("log")
-        ax.set_title("VSWR - 3-element Yagi", fontsize=10)
-        ax.set_xlabel("Frequency (MHz)")
-        ax.set_ylabel("VSWR")
-
-        ax.set_ylim(1, 6)
-
-        majorLocator = mpl.ticker.MultipleLocator(1)
-        majorFormatter = mpl.ticker.FormatStrFormatter('%d')
-        minorLocator = mpl.ticker.MultipleLocator(0.5)
-        minorFormatter = mpl.ticker.FormatStrFormatter('')
-        ax.yaxis.set_major_locator(majorLocator)
-        ax.yaxis.set_major_formatter(majorFormatter)
-        ax.yaxis.set_minor_locator(minorLocator)
-        ax.yaxis.set_minor_formatter(minorFormatter)    
-        ax.yaxis.grid(True, which='minor', color='0.6', linestyle='dotted')
-        ax.yaxis.grid(True, which='major', color='0.6', linestyle='solid')
-        ax.grid(True)
+        ax = self.vswrAxes
+        self.vswrLine.set_data(freqs, vswrs)
+        ax.relim()
+        ax.autoscale_view()
 
         
         #### Optionally plot optimization map in lieu of F/B in slot (224)
         #### Optimization map is useful to test whether opt bounds are capturing the best point
-        optMap = True # "True" plots opimizaiton map.  "False" plots F/B ratio vs frequency
-        
-        global sampledResults, sampledL3, sampledD2
-        if optMap and sampledResults:
+        samples = self._trace[:iteration_count]
+        if self.optMap and len(samples):
+            if self.mapScatter is None:
+                self.create_map_plot()
             '''
             i=0
             for result in sampledResults:
@@ -992,103 +1861,59 @@ class uiMainWindow(QMainWindow):
             #sampledResults[::-1] # sort descending
             print(min(sampledResults), max(sampledResults))
             '''
-            i=0
-            for result in sampledResults:
-                if result > -150: sampledResults[i]=-150
-                i=i+1
-            #norm = mpl.colors.Normalize(vmin=min(sampledResults), vmax=max(sampledResults))
-            norm = mpl.colors.Normalize(vmin=-200, vmax=-150, clip=True)
-
-            cmap = mpl.cm.cool
-            ax = plt.subplot(224)
-            ax.scatter(sampledL3, sampledD2, c=sampledResults, 
-                cmap=cmap, norm=norm, edgecolors='face', alpha=0.25)
-            ax.scatter(sampledL3, sampledD1, c=sampledResults, 
-                cmap=cmap, norm=norm, edgecolors='face', alpha=0.25)
-            ax.scatter(sampledL3, sampledL2, c=sampledResults, 
-                cmap=cmap, norm=norm, edgecolors='face', alpha=0.25)
-            ax.scatter(sampledL1, sampledL2, c=sampledResults, 
-                cmap=cmap, norm=norm, edgecolors='face', alpha=0.25)
-            ax.set_title("Optimization path", fontsize=10)
-            ax.set_xlabel("Director Length (m)")
-            ax.set_ylabel("Director Distance (m)")
-            self.main_figure.figure.colorbar(mpl.cm.ScalarMappable(norm=norm, cmap=cmap), ax=ax)
-            ax.grid(True)
+            # The four parameter pairs are stacked into a single point cloud: L3/D2, L3/D1, L3/L2, L1/L2
+            offsets = np.concatenate([samples[:, [x, y]] for x, y in ((2, 4), (2, 3), (2, 1), (0, 1))])
+            results = np.tile(np.clip(samples[:, 5], -200, -150), 4)
+            ax = self.fbMapAxes
+            self.mapScatter.set_offsets(offsets)
+            self.mapScatter.set_array(results)
+            ax.ignore_existing_data_limits = True
+            ax.update_datalim(offsets)
+            ax.autoscale_view()
         else:
             #### Plot F/B vs frequency 
-            f_to_b = np.array(fwd_gains) - np.array(rev_gains)
-            ax = plt.subplot(224)
-            ax.plot(freqs, f_to_b, label="F/B Ratio (dB)")
-            self.draw_frequency_ranges(ax)
-
-            ax.set_title("F/B - 3-element Yagi", fontsize=10)
-            ax.set_xlabel("Frequency (MHz)")
-            ax.set_ylabel("F/B Ratio (dB)")
-
-            #yMaxLimit = math.ceil(min(40, math.ceil(max(f_to_b)))/5) * 5 # Set upper limit to the 5 dB value >= the max F/B
-            #ax.set_ylim(yMaxLimit-40, yMaxLimit)                         #  but cap at 40 dB with 40 dB range
-            ax.set_ylim(0, 40)                    
-
-            majorLocator = mpl.ticker.MultipleLocator(10)
-            majorFormatter = mpl.ticker.FormatStrFormatter('%d')
-            minorLocator = mpl.ticker.MultipleLocator(5)
-            minorFormatter = mpl.ticker.FormatStrFormatter('')
-            ax.yaxis.set_major_locator(majorLocator)
-            ax.yaxis.set_major_formatter(majorFormatter)
-            ax.yaxis.set_minor_locator(minorLocator)
-            ax.yaxis.set_minor_formatter(minorFormatter)
-            ax.yaxis.grid(True, which='minor', color='0.6', linestyle='dotted')
-            ax.yaxis.grid(True, which='major', color='0.6', linestyle='solid')
-            ax.grid(True)
+            if self.mapScatter is not None:
+                self.create_fb_plot()
+            f_to_b = fwd_gains - rev_gains
+            ax = self.fbMapAxes
+            self.fbLine.set_data(freqs, f_to_b)
+            ax.relim()
+            ax.autoscale_view()
         ##############################################
 
 
 
         ##############################################
-        # repeat simulation and get full spherical radiation pattern at design frequency
-        plot_3d = True # "True" selects 3-D plot.  "False" selects 2-D plot for subplot (223)        
-
-        geo_opt = self.geometry_yagi(l1, l2, l3, d1, d2)
-        geo_opt.set_frequency(self.design_freq_mhz)
-        if plot_3d:
-            geo_opt.radiation_pattern(thetas=Range(0, 184, count=46), phis=Range(0,364,count=91), average=0) # python crashes if both counts>1 and average<>0 
+        # get full spherical radiation pattern at design frequency (on the geometry simulated for the impedance)
+        if self.plot_3d:
+            gains_db, thetas, phis = self.get_pattern(l1, l2, l3, d1, d2, self.design_freq_mhz, *REPORT_PATTERN_3D, nec=nec)
         else:
-            geo_opt.radiation_pattern(thetas=Range(-180, 180, count=180), phis=Range(0,360,count=180), average=0) # python crashes if both counts>1 and average<>0 
-        rp = geo_opt.context.get_radiation_pattern(0) #get the radiation_pattern
-
-        gains_db = rp.get_gain() # Is an array of theta,phi -> gain (in dBi).
-        thetas = rp.get_theta_angles()
-        phis = rp.get_phi_angles()
-
-        # convert angles from degrees to radians
-        thetas = np.deg2rad(thetas)
-        phis = np.deg2rad(phis)
+            gains_db, thetas, phis = self.get_pattern(l1, l2, l3, d1, d2, self.design_freq_mhz, *REPORT_PATTERN_2D, nec=nec)
      
-        if plot_3d:
+        if self.plot_3d:
             #### Plot 3-D representation of the antenna pattern 
             # TODO: Figure out why i get a pick support warning. I think it is mplcursors related. 
             #       Need to turn it off when hovering over 3D plot?)
-            max_gain, max_theta, max_phi = plot_pattern_3d(gains_db, thetas, phis, subplot_num=223, scaling = "ARRL")
+            max_gain, max_theta, max_phi = plot_pattern_3d(gains_db, thetas, phis, self.get_pattern_trig(*REPORT_PATTERN_3D), scaling = "ARRL")
 
             print ("Maximal gain is %0.2f dBi" % (max_gain))
-            print ("   at an elevation angle of %0.1f degrees" % (max_theta * 180.0 / np.pi))
-            print ("   at an azimuthal angle of %0.1f degrees" % (max_phi * 180.0 / np.pi))
+            print ("   at an elevation angle of %0.1f degrees" % (max_theta / DEG2RAD))
+            print ("   at an azimuthal angle of %0.1f degrees" % (max_phi / DEG2RAD))
 
             self.performanceLabel.setText("Max Gain: %0.2f dBi   VSWR: %5.2f  Impedance: (%0.2f,%+0.2fj)%s @ %0.2f MHz" % 
-                                        (max_gain, vswr(z, self.system_impedance), z.real[0], z.imag[0], Omega, freq_mhz))
+                                        (max_gain, z_vswr, z.real[0], z.imag[0], Omega, freq_mhz))
 
 
         else:
             #### Plot 2-D representation of the antenna pattern 
-            max_gain, max_theta, max_phi = plot_pattern_2d(gains_db, thetas, phis, 
-                                                           subplot_num=223, label="Design Frq")
+            max_gain, max_theta, max_phi = plot_pattern_2d(gains_db, thetas, phis, label="Design Frq")
 
             print ("Maximal gain is %0.2f dBi" % (max_gain))
-            print ("   at an elevation angle of %0.1f degrees" % (max_theta * 180.0 / np.pi))
-            print ("   at an azimuthal angle of %0.1f degrees" % (max_phi * 180.0 / np.pi))
+            print ("   at an elevation angle of %0.1f degrees" % (max_theta / DEG2RAD))
+            print ("   at an azimuthal angle of %0.1f degrees" % (max_phi / DEG2RAD))
 
             self.performanceLabel.setText("Max Gain: %0.2f dBi   VSWR: %5.2f  Impedance: (%0.2f,%+0.2fj)%s @ %0.2f MHz" % 
-                                        (max_gain, vswr(z, self.system_impedance), z.real[0], z.imag[0], Omega, freq_mhz))
+                                        (max_gain, z_vswr, z.real[0], z.imag[0], Omega, freq_mhz))
 
 
             ''' These additional patterns are interesting but clutter the plot. So make them optional
@@ -1096,54 +1921,37 @@ class uiMainWindow(QMainWindow):
             plot_2d_more_freqs = False
             if plot_2d_more_freqs == True:
 
-                # Analyze and plot another pattern at the start optimization freq
-                geo_opt = self.geometry_yagi(l1, l2, l3, d1, d2)
-                geo_opt.set_frequency(self.start_frq_opt)
-                geo_opt.radiation_pattern(thetas=Range(-180, 180, count=180), phis=Range(0,360,count=180), average=0) # python crashes if both counts>1 and average<>0 
-                rp = geo_opt.context.get_radiation_pattern(0) #get the radiation_pattern
-
-                gains_db = rp.get_gain() # Is an array of theta,phi -> gain (in dBi).
-                thetas = rp.get_theta_angles() * np.pi / 180.0
-                phis = rp.get_phi_angles() * np.pi / 180.0
-
-                plot_pattern_2d(gains_db, thetas, phis, subplot_num=223, 
-                                line = "dotted", label = "Min Frq")
-                
-
-                # Analyze and plot another pattern at the stop optimization freq
-                geo_opt = self.geometry_yagi(l1, l2, l3, d1, d2)
-                geo_opt.set_frequency(self.stop_frq_opt)
-                geo_opt.radiation_pattern(thetas=Range(-180, 180, count=180), phis=Range(0,360,count=180), average=0) # python crashes if both counts>1 and average<>0 
-                rp = geo_opt.context.get_radiation_pattern(0) #get the radiation_pattern
-
-                gains_db = rp.get_gain() # Is an array of theta,phi -> gain (in dBi).
-                thetas = rp.get_theta_angles() * np.pi / 180.0
-                phis = rp.get_phi_angles() * np.pi / 180.0
-
-                plot_pattern_2d(gains_db, thetas, phis, subplot_num=223, 
-                                line = "dotted", label = "Max Frq")
-                
-
-                # Analyze and plot another pattern at the geometric mean of the optimization freqs
-                geo_opt = self.geometry_yagi(l1, l2, l3, d1, d2)
-                geo_opt.set_frequency(math.sqrt(self.start_frq_opt*self.stop_frq_opt))
-                geo_opt.radiation_pattern(thetas=Range(-180, 180, count=180), phis=Range(0,360,count=180), average=0) # python crashes if both counts>1 and average<>0 
-                rp = geo_opt.context.get_radiation_pattern(0) #get the radiation_pattern
-
-                gains_db = rp.get_gain() # Is an array of theta,phi -> gain (in dBi).
-                thetas = rp.get_theta_angles() * np.pi / 180.0
-                phis = rp.get_phi_angles() * np.pi / 180.0
-                
-                plot_pattern_2d(gains_db, thetas, phis, subplot_num=223,  
-                                line = "dotted", label = "Midband")
+                # Analyze and plot other patterns at the start and stop optimization freqs
+                # and at their geometric mean.  The three are solved together (see get_patterns).
+                # A single frequency optimization range has only the one pattern to plot.
+                extra_freqs = {"Min Frq": self.start_frq_opt}
+                if not math.isclose(self.start_frq_opt, self.stop_frq_opt):
+                    extra_freqs.update({"Max Frq": self.stop_frq_opt, "Midband": self.mid_frq_opt})
+                patterns = self.get_patterns(l1, l2, l3, d1, d2, extra_freqs.values(), *REPORT_PATTERN_2D, nec=nec)
+                for label, (gains_db, thetas, phis) in zip(extra_freqs, patterns):
+                    plot_pattern_2d(gains_db, thetas, phis, line = "dotted", label = label)
+                for label in ("Max Frq", "Midband"): # clear lines left from a report of a wider range
+                    if label not in extra_freqs and label in self.patternLines:
+                        for pattern_line in self.patternLines[label]:
+                            pattern_line.set_data([], [])
 
         
 
-        # Interactively display the label when cursor hovers over a line
-        mplcursors.cursor(hover=mplcursors.HoverMode.Transient).connect(
-           "add", lambda sel: sel.annotation.set_text(sel.artist.get_label()))
-
-        ax.figure.canvas.draw()   
+        # Interactively display the label when cursor hovers over a line.  A cursor only knows
+        # the artists present when it was created, so it is replaced only when this report
+        # added or replaced artists (e.g. the optimization map).  The 3-D surface, replaced by
+        # every 3-D report, is left out: it has no pick support for a cursor to use.
+        figure = self.main_figure.figure
+        artists = [artist for ax in figure.axes for artist in (*ax.lines, *ax.collections)
+                   if artist is not self.patternSurface]
+        if self.reportCursorArtists != artists:
+            if self.reportCursor is not None:
+                self.reportCursor.remove()
+            self.reportCursor = mplcursors.cursor(artists, hover=mplcursors.HoverMode.Transient)
+            self.reportCursor.connect("add", self.onCursorAdd)
+            self.reportCursorArtists = artists
+
+        self.main_figure.canvas.draw_idle()   
     #####################################################################################
 
 
@@ -1153,6 +1961,7 @@ class uiMainWindow(QMainWindow):
 #### Start application and UI Loop ####
 #######################################
 if __name__ == "__main__":
+    multiprocessing.freeze_support() # the pool's worker processes are spawned on Windows, also from a frozen executable
     app = QApplication(sys.argv)        
     ui = uiMainWindow()
     ui.show()
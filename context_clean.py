@@ -67,6 +67,12 @@ class context_clean(object):
     def set_frequency(self, frequency):
         self.set_frequencies_linear(frequency, frequency)
 
+    def set_frequencies_stepped(self, start_frequency, step_size, count):
+        """ Linear sweep of count frequencies, step_size apart, beginning at start_frequency """
+        ifrq_linear_step = 0
+        debug("FR", ifrq_linear_step, count, start_frequency, step_size, 0, 0, 0)
+        self.context.fr_card(ifrq_linear_step, count, start_frequency, step_size)
+
     def clear_ground(self):
         gn_nullify_ground = -1
         self.context.gn_card(gn_nullify_ground, 0, 0, 0, 0, 0, 0, 0)